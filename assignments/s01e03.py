@@ -1,22 +1,40 @@
 import json
 import os
 
-import requests
-from openai import OpenAI
+import http_client
 from dotenv import load_dotenv
-from utils import verify_json
+from llm_client import chat
+from utils import compile_schema, verify_json
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 POLIGON_BASE_URL = os.getenv("POLIGON_BASE_URL")
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
+
+TEST_DATA_SCHEMA = compile_schema({
+    "type": "object",
+    "required": ["test-data"],
+    "properties": {
+        "test-data": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["question", "answer"],
+                "properties": {
+                    "question": {"type": "string"},
+                    "answer": {"type": "number"},
+                    "test": {
+                        "type": "object",
+                        "required": ["q", "a"],
+                        "properties": {
+                            "q": {"type": "string"},
+                            "a": {"type": "string"},
+                        },
+                    },
+                },
+            },
+        },
+    },
+})
 
 with open('assignments/data/s01e03_data.json', 'r') as file:
     data_dict = json.load(file)
@@ -31,7 +49,7 @@ for i in test_data:
     }
 
     if "test" in i.keys():
-        chat_response = openai_client.chat.completions.create(
+        chat_response = chat(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "Answer the question using minimum number of words possible."},
@@ -49,7 +67,7 @@ for i in test_data:
 data_dict_fixed = data_dict.copy()
 data_dict_fixed['test-data'] = test_data_fixed
 
-verified_json = verify_json(data_dict_fixed)
+verified_json = verify_json(data_dict_fixed, schema=TEST_DATA_SCHEMA)
 
 with open("assignments/data/s01e03_data_fixed.json", 'w') as file:
     json.dump(data_dict_fixed, file, indent=4)
@@ -65,7 +83,7 @@ payload = {
 }
 
 # Send the POST request
-response = requests.post(verify_url, data=json.dumps(payload))
+response = http_client.post(verify_url, data=json.dumps(payload))
 
 # Check if the request was successful
 if response.status_code == 200:
@@ -1,25 +1,17 @@
-import requests
+import http_client
 import json
 import logging
 import os
 
-from openai import OpenAI
 from dotenv import load_dotenv
+from llm_client import chat
 from utils import get_custom_response, verify_json
 
 # Load variables from the .env file
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
 
 
 # Configure logging
@@ -31,7 +23,7 @@ def main():
 
     try:
         # Download the text file
-        response = requests.get(url)
+        response = http_client.get(url)
         if response.status_code != 200:
             logging.error(f"Failed to download the file. Status code: {response.status_code}")
             return
@@ -50,7 +42,7 @@ def main():
         ]
 
         # Call the OpenAI API
-        chat_response = openai_client.chat.completions.create(
+        chat_response = chat(
             model="gpt-4o",
             messages=messages,
             temperature=0,
@@ -72,7 +64,7 @@ def main():
         # Submit the processed output
         submit_url = f"{CENTRALA_BASE_URL}/report"
         headers = {'Content-Type': 'application/json'}
-        submission_response = requests.post(submit_url, json=payload, headers=headers)
+        submission_response = http_client.post(submit_url, json=payload, headers=headers)
 
         if submission_response.status_code == 200:
             logging.info("Submission successful.")
@@ -1,4 +1,4 @@
-import requests
+import http_client
 import json
 import logging
 import os
@@ -19,7 +19,7 @@ def main():
 
     try:
         # Download the text file
-        response = requests.get(url)
+        response = http_client.get(url)
         if response.status_code != 200:
             logging.error(f"Failed to download the file. Status code: {response.status_code}")
             return
@@ -83,7 +83,7 @@ def main():
         # Submit the processed output
         submit_url = f"{CENTRALA_BASE_URL}/report"
         headers = {'Content-Type': 'application/json'}
-        submission_response = requests.post(submit_url, json=payload, headers=headers)
+        submission_response = http_client.post(submit_url, json=payload, headers=headers)
 
         if submission_response.status_code == 200:
             logging.info("Submission successful.")
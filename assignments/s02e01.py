@@ -1,26 +1,30 @@
+import hashlib
+import tempfile
 import zipfile
 import os
-import requests
+import http_client
 import json
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from openai import OpenAI
 from dotenv import load_dotenv
 
+from llm_client import chat, transcribe
+
 # Load variables from the .env file
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
 API_ENDPOINT = f"{CENTRALA_BASE_URL}/report"
+TRANSCRIPTION_CACHE_DIR = "cache/transcriptions"
+MAX_TRANSCRIPTION_WORKERS = 4
+# Zip members up to this size are spooled in memory, larger ones to a temporary file
+SPOOL_MAX_SIZE = 32 * 1024 * 1024
+
+# A member of an open zip archive, read without extracting it to disk
+ZipMember = namedtuple("ZipMember", ["zip_ref", "info"])
 
 
 def extract_files(zip_file_path, extract_to):
@@ -32,21 +36,57 @@ def extract_files(zip_file_path, extract_to):
             extracted_files.append(os.path.join(extract_to, file_name))
     return extracted_files
 
-def transcribe_audio(file_path):
-    """Transcribes an .m4a audio file using OpenAI's Whisper model."""
-    try:
-        with open(file_path, 'rb') as audio_file:
-            print(file_path)
-            transcription = openai_client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="text"
-            )
-            print(transcription[100])
-            return transcription
-    except Exception as e:
-        print(f"Error transcribing file {file_path}: {e}")
-        return ""
+def iter_zip_members(zip_ref):
+    """Yields the file members of an open ZipFile as ZipMember sources, without extracting them."""
+    for info in zip_ref.infolist():
+        if not info.is_dir():
+            yield ZipMember(zip_ref, info)
+
+def source_name(source):
+    """Returns the display name of an audio source: a file path or a ZipMember."""
+    return source.info.filename if isinstance(source, ZipMember) else source
+
+def open_source(source):
+    """Opens an audio source for binary reading; zip members are decompressed as they are read."""
+    if isinstance(source, ZipMember):
+        return source.zip_ref.open(source.info)
+    return open(source, 'rb')
+
+def file_sha256(source):
+    """Returns the SHA-256 of a source's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open_source(source) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def spool_source(source):
+    """Decompresses a source once into a SpooledTemporaryFile, hashing it on the way.
+
+    Returns a (sha256, spooled file) tuple; the file is rewound and must be closed by the caller.
+    """
+    digest = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    with open_source(source) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+            spool.write(chunk)
+    spool.seek(0)
+    return digest.hexdigest(), spool
+
+def transcribe_audio(source, audio_file=None):
+    """Transcribes an .m4a audio file or zip member using OpenAI's Whisper model.
+
+    An already open audio_file (e.g. from spool_source) is read instead of reopening the source.
+    """
+    name = source_name(source)
+    if audio_file is None:
+        with open_source(source) as audio_file:
+            return transcribe_audio(source, audio_file)
+    print(name)
+    transcription = transcribe((os.path.basename(name), audio_file), response_format="text")
+    print(transcription[:100])
+    return transcription
 
 def determine_professor_maj_location(transcription_text):
     """Uses OpenAI's LLM to find where Professor Andrzej Maj works."""
@@ -69,7 +109,7 @@ def determine_professor_maj_location(transcription_text):
                 •	Parkowa Street
                 """
         )
-        chat_response = openai_client.chat.completions.create(
+        chat_response = chat(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -91,7 +131,7 @@ def send_response(answer):
         "answer": answer
     }
     try:
-        response = requests.post(API_ENDPOINT, json=payload)
+        response = http_client.post(API_ENDPOINT, json=payload)
         if response.status_code == 200:
             print("Response sent successfully.")
             print(response.json())
@@ -101,22 +141,88 @@ def send_response(answer):
     except Exception as e:
         print(f"Error sending response: {e}")
 
-def get_or_create_transcription(extracted_files):
-    """Gets cached transcription or creates new one."""
-    cache_file = "cache/transcription.txt"
-    os.makedirs("cache", exist_ok=True)
-    
-    if os.path.exists(cache_file):
-        with open(cache_file, "r", encoding="utf-8") as f:
-            return f.read()
-    
-    transcriptions = [transcribe_audio(file_path) for file_path in extracted_files]
-    combined_transcription = " ".join(transcriptions).strip()
-    
-    with open(cache_file, "w", encoding="utf-8") as f:
-        f.write(combined_transcription)
-    
-    return combined_transcription
+def get_or_create_file_transcription(source):
+    """Gets the cached transcription of a single file or zip member, keyed by its content hash, or creates it.
+
+    Zip members are decompressed only once: the hash is taken while spooling the content,
+    and a cache miss uploads from the spool. Returns a (transcription, reused) tuple.
+    Failed transcriptions raise and are never cached.
+    """
+    if isinstance(source, ZipMember):
+        content_hash, audio_file = spool_source(source)
+    else:
+        content_hash, audio_file = file_sha256(source), None
+    try:
+        cache_file = os.path.join(TRANSCRIPTION_CACHE_DIR, f"{content_hash}.txt")
+        if os.path.exists(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as f:
+                return f.read(), True
+
+        transcription = transcribe_audio(source, audio_file)
+    finally:
+        if audio_file is not None:
+            audio_file.close()
+
+    # Write to a temp file first so an interrupted run never leaves a partial entry
+    tmp_file = f"{cache_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(transcription)
+    os.replace(tmp_file, cache_file)
+    return transcription, False
+
+def get_or_create_transcription(sources, max_workers=MAX_TRANSCRIPTION_WORKERS):
+    """Transcribes files or zip members on a thread pool, reusing per-file cached transcriptions.
+
+    Returns the combined transcription (in the order of sources) and a report
+    with the names of the files that were reused, transcribed and failed.
+    """
+    os.makedirs(TRANSCRIPTION_CACHE_DIR, exist_ok=True)
+    transcriptions = {}
+    report = {"reused": [], "transcribed": [], "failed": []}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(get_or_create_file_transcription, source): source_name(source)
+            for source in sources
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                transcription, reused = future.result()
+            except Exception as e:
+                print(f"Error transcribing file {name}: {e}")
+                report["failed"].append(name)
+                continue
+            transcriptions[name] = transcription
+            report["reused" if reused else "transcribed"].append(name)
+
+    for key in report:
+        report[key].sort()
+    print(f"Transcriptions reused: {report['reused']}")
+    print(f"Transcriptions created: {report['transcribed']}")
+    if report["failed"]:
+        print(f"Transcriptions failed: {report['failed']}")
+
+    names = [source_name(source) for source in sources]
+    combined_transcription = " ".join(transcriptions[name] for name in names if name in transcriptions).strip()
+    return combined_transcription, report
+
+def main_streaming(zip_file_path):
+    # Step 1: Read the members straight from the archive, nothing is written to disk
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+        members = list(iter_zip_members(zip_ref))
+        if not members:
+            print("No files found in the zip archive.")
+            return
+
+        # Step 2: Get or create transcription
+        combined_transcription, _ = get_or_create_transcription(members)
+
+    # Step 3: Query LLM to determine where Professor Andrzej Maj works
+    answer = determine_professor_maj_location(combined_transcription)
+
+    # Step 4: Send the answer to the specified endpoint
+    send_response(answer)
 
 def main(zip_file_path):
     # Define extraction directory
@@ -130,7 +236,7 @@ def main(zip_file_path):
         return
 
     # Step 2: Get or create transcription
-    combined_transcription = get_or_create_transcription(extracted_files)
+    combined_transcription, _ = get_or_create_transcription(extracted_files)
 
     # Step 3: Query LLM to determine where Professor Andrzej Maj works
     answer = determine_professor_maj_location(combined_transcription)
@@ -146,4 +252,4 @@ def main(zip_file_path):
 if __name__ == "__main__":
     # Example usage
     zip_file_path = "data/przesluchania.zip"  # Replace with your zip file path
-    main(zip_file_path)
\ No newline at end of file
+    main_streaming(zip_file_path)
\ No newline at end of file
@@ -1,27 +1,102 @@
 import os
-import base64
-from openai import OpenAI
+import hashlib
+import io
+import json
 import logging
+import sys
 import time
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
-from utils import post_json_data_to_url
+from image_prep import describe_savings, prepare_image, to_data_url
+from llm_client import chat, iter_batches, track_usage, transcribe
+from utils import compile_schema, post_json_data_to_url, verify_json
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
+CLASSIFICATION_CACHE_FILE = "cache/factory_classification.json"
+CLASSIFICATION_MODEL = "gpt-4o-mini"
+CATEGORIES = ("people", "hardware", "other")
+MAX_TEXT_WORKERS = 8
+MAX_VISION_WORKERS = 4
+MAX_AUDIO_WORKERS = 4
+# 'single' asks for OCR text and category in one vision call, 'chain' runs OCR first.
+# Stays on 'chain' until benchmark_image_modes shows both modes give the same categories.
+IMAGE_ANALYSIS_MODE = "chain"
+# Text reports can be classified several per request, within these limits. Off until
+# benchmark_text_modes shows batching gives the same categories as one report per request.
+TEXT_BATCH_MODE = False
+TEXT_BATCH_MAX_SIZE = 20
+TEXT_BATCH_MAX_TOKENS = 6000
+
+CATEGORIZATION_PROMPT = """
+        You are an expert in analyzing content.
+        You will be given reports from a factory.
+        Please categorize the reports containing information about captured people or traces of their PRESENCE,
+        as well as notes about repaired hardware issues. Information about absence of people should be categorized as 'other'.
+        Those related to software should be categorized as 'other'.
+        Your task is to categorize reports into one of the following categories:
+        - people
+        - hardware
+        - other
+        Respond ONLY with the category name.
+    """
+
+IMAGE_ANALYSIS_PROMPT = """
+        You are an expert in analyzing content.
+        You will be given a photo or scan of a report from a factory.
+        First extract all text visible in the image. If there is no text, use an empty string.
+        Then categorize the report, using the text if there is any and the image itself otherwise.
+        Reports containing information about captured people or traces of their PRESENCE are 'people',
+        notes about repaired hardware issues are 'hardware'. Information about absence of people
+        and anything related to software is 'other'.
+        Respond with a JSON object: {"text": "<extracted text>", "category": "people|hardware|other"}
+    """
+
+BATCH_CATEGORIZATION_PROMPT = CATEGORIZATION_PROMPT.replace(
+    "Respond ONLY with the category name.",
+    """You will receive several reports, each starting with a line '### <filename>'.
+        Categorize every report independently.
+        Respond with a JSON object: {"results": [{"filename": "<filename>", "category": "people|hardware|other"}]}
+        with exactly one entry for every report.""",
 )
 
+BATCH_CATEGORIZATION_SCHEMA = compile_schema({
+    "type": "object",
+    "required": ["results"],
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["filename", "category"],
+                "properties": {
+                    "filename": {"type": "string"},
+                    "category": {"enum": ["people", "hardware", "other"]},
+                },
+            },
+        },
+    },
+})
+
+IMAGE_ANALYSIS_SCHEMA = compile_schema({
+    "type": "object",
+    "required": ["text", "category"],
+    "properties": {
+        "text": {"type": "string"},
+        "category": {"enum": ["people", "hardware", "other"]},
+    },
+})
+
+
+# Part of the classification cache key, so editing a prompt invalidates the cached results
+PROMPT_HASH = hashlib.sha256(
+    "\n".join([CATEGORIZATION_PROMPT, BATCH_CATEGORIZATION_PROMPT, IMAGE_ANALYSIS_PROMPT]).encode('utf-8')
+).hexdigest()[:16]
+
 
 def setup_logging():
     logging.basicConfig(
@@ -35,23 +110,22 @@ def setup_logging():
     return logging.getLogger('factory_analyzer')
 
 
-def image_to_base64(image_path, logger):
-    logger.info(f'Converting image to base64: {image_path}')
+def image_to_data_url(image_path, logger):
+    logger.info(f'Preparing image: {image_path}')
     try:
-        with open(image_path, 'rb') as image_file:
-            encoded = base64.b64encode(image_file.read()).decode('utf-8')
-            logger.debug(f'Successfully encoded image: {image_path}')
-            return encoded
+        prepared = prepare_image(image_path)
+        logger.info(f'Prepared image {image_path}: {describe_savings(prepared)}')
+        return to_data_url(prepared)
     except Exception as e:
         logger.error(f'Error encoding image {image_path}: {str(e)}')
         raise
 
 
-def extract_text_from_image(client, base64_image, logger):
+def extract_text_from_image(image_data_url, logger):
     logger.info('Extracting text from image')
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = chat(
+            model=CLASSIFICATION_MODEL,
             messages=[
                 {
                     "role": "user",
@@ -63,7 +137,7 @@ def extract_text_from_image(client, base64_image, logger):
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": image_data_url
                             }
                         }
                     ]
@@ -77,27 +151,81 @@ def extract_text_from_image(client, base64_image, logger):
         raise
 
 
-def analyze_content(client, content, content_type, logger):
+def classify_text_batch(reports, logger):
+    """Classifies several text reports in one request.
+
+    Args:
+        reports (dict): filename -> report text.
+
+    Returns:
+        dict: filename -> category. Reports missing from the response, or the whole batch if the
+            response is malformed, are classified one by one instead; a report whose fallback
+            also fails is logged and left out, so only that report is counted as failed.
+    """
+    logger.info(f'Classifying {len(reports)} text reports in one request')
+    categories = {}
+    try:
+        response = chat(
+            model=CLASSIFICATION_MODEL,
+            messages=[
+                {"role": "system", "content": BATCH_CATEGORIZATION_PROMPT},
+                {"role": "user", "content": "\n\n".join(
+                    f"### {filename}\n{text}" for filename, text in reports.items()
+                )},
+            ],
+            response_format={"type": "json_object"},
+        )
+        batch_result = verify_json(response.choices[0].message.content, schema=BATCH_CATEGORIZATION_SCHEMA)
+        for item in batch_result["results"]:
+            if item["filename"] in reports:
+                categories[item["filename"]] = item["category"]
+    except Exception as e:
+        logger.error(f'Error in batch classification, falling back to single reports: {str(e)}')
+
+    missing = [filename for filename in reports if filename not in categories]
+    if missing:
+        logger.info(f'Classifying {len(missing)} reports missing from the batch response one by one')
+    for filename in missing:
+        try:
+            categories[filename] = analyze_content(reports[filename], 'text', logger)
+        except Exception as e:
+            logger.error(f'Error classifying report {filename}: {str(e)}')
+    return categories
+
+
+def analyze_image_single_call(image_data_url, logger):
+    """Extracts the text of an image and categorizes it with one structured vision call.
+
+    Returns a dict with 'text' and 'category'.
+    """
+    logger.info('Extracting text and category from image in a single call')
+    response = chat(
+        model=CLASSIFICATION_MODEL,
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": IMAGE_ANALYSIS_PROMPT},
+                    {"type": "image_url", "image_url": {"url": image_data_url}},
+                ],
+            }
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=600,
+    )
+    return verify_json(response.choices[0].message.content, schema=IMAGE_ANALYSIS_SCHEMA)
+
+
+def analyze_content(content, content_type, logger, image_mode=IMAGE_ANALYSIS_MODE):
     logger.info(f'Starting content analysis of type: {content_type}')
     start_time = time.time()
-    system_prompt = """
-        You are an expert in analyzing content.
-        You will be given reports from a factory.
-        Please categorize the reports containing information about captured people or traces of their PRESENCE,
-        as well as notes about repaired hardware issues. Information about absence of people should be categorized as 'other'.
-        Those related to software should be categorized as 'other'.
-        Your task is to categorize reports into one of the following categories:
-        - people
-        - hardware
-        - other
-        Respond ONLY with the category name.
-    """
-    
+    system_prompt = CATEGORIZATION_PROMPT
+
     try:
         if content_type == 'text':
             logger.debug('Sending text to GPT-4')
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
+            response = chat(
+                model=CLASSIFICATION_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": content}
@@ -105,15 +233,20 @@ def analyze_content(client, content, content_type, logger):
             )
             result = response.choices[0].message.content
 
+        elif content_type == 'image' and image_mode == 'single':
+            analysis = analyze_image_single_call(content, logger)
+            logger.debug(f'Extracted text: {analysis["text"]}')
+            result = analysis['category']
+
         elif content_type == 'image':
             logger.debug('Extracting text from image before analysis')
-            extracted_text = extract_text_from_image(client, content, logger)
+            extracted_text = extract_text_from_image(content, logger)
             logger.debug(f'Extracted text: {extracted_text}')
             
             if extracted_text.lower() == 'no text found':
                 logger.debug('No text found, analyzing image directly')
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
+                response = chat(
+                    model=CLASSIFICATION_MODEL,
                     messages=[
                         {
                             "role": "user",
@@ -125,7 +258,7 @@ def analyze_content(client, content, content_type, logger):
                                 {
                                     "type": "image_url",
                                     "image_url": {
-                                        "url": f"data:image/jpeg;base64,{content}"
+                                        "url": content
                                     },
                                 },
                             ],
@@ -135,22 +268,17 @@ def analyze_content(client, content, content_type, logger):
                 result = response.choices[0].message.content
             else:
                 logger.debug('Analyzing extracted text')
-                result = analyze_content(client, extracted_text, 'text', logger)
+                result = analyze_content(extracted_text, 'text', logger)
 
         elif content_type == 'audio':
             logger.debug('Starting audio transcription')
-            with open('temp_audio.mp3', 'wb') as f:
-                f.write(content)
-            
-            with open('temp_audio.mp3', 'rb') as audio_file:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file
-                )
-            
-            os.remove('temp_audio.mp3')
+            # Raw bytes are uploaded from a named in-memory buffer; the name tells Whisper the format
+            if isinstance(content, bytes):
+                content = io.BytesIO(content)
+                content.name = 'audio.mp3'
+            transcript = transcribe(content)
             logger.debug('Analyzing audio transcript')
-            result = analyze_content(client, transcript.text, 'text', logger)
+            result = analyze_content(transcript, 'text', logger)
 
         elapsed_time = time.time() - start_time
         logger.info(f'Completed {content_type} analysis. Time: {elapsed_time:.2f}s. Result: {result}')
@@ -161,7 +289,69 @@ def analyze_content(client, content, content_type, logger):
         raise
 
 
-def read_and_analyze_factory_files(openai_client, directory):
+def file_sha256(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def classification_cache_key(content_hash, mode=None):
+    """Cache key of a file's classification: its content hash plus the model, prompts and
+    analysis mode used ('single'/'chain' for images, 'batch'/'single' for text reports)."""
+    if mode:
+        return f"{CLASSIFICATION_MODEL}:{PROMPT_HASH}:{mode}:{content_hash}"
+    return f"{CLASSIFICATION_MODEL}:{PROMPT_HASH}:{content_hash}"
+
+
+def analysis_mode(filename, image_mode, text_batch_mode):
+    """Returns the mode a file is analyzed with, for its cache key; None for audio."""
+    if filename.endswith('.png'):
+        return image_mode
+    if filename.endswith('.txt'):
+        return 'batch' if text_batch_mode else 'single'
+    return None
+
+
+def load_classification_cache():
+    if os.path.exists(CLASSIFICATION_CACHE_FILE):
+        with open(CLASSIFICATION_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_classification_cache(cache):
+    os.makedirs(os.path.dirname(CLASSIFICATION_CACHE_FILE), exist_ok=True)
+    tmp_file = f"{CLASSIFICATION_CACHE_FILE}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_file, CLASSIFICATION_CACHE_FILE)
+
+
+def analyze_file(file_path, logger, image_mode=IMAGE_ANALYSIS_MODE):
+    filename = os.path.basename(file_path)
+    if filename.endswith('.txt'):
+        logger.debug(f'Reading text file: {filename}')
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return analyze_content(f.read(), 'text', logger)
+
+    elif filename.endswith('.png'):
+        logger.debug(f'Reading image file: {filename}')
+        image_data_url = image_to_data_url(file_path, logger)
+        return analyze_content(image_data_url, 'image', logger, image_mode=image_mode)
+
+    elif filename.endswith('.mp3'):
+        logger.debug(f'Reading audio file: {filename}')
+        with open(file_path, 'rb') as f:
+            return analyze_content(f, 'audio', logger)
+
+
+def analyze_single_file(file_path, logger, image_mode=IMAGE_ANALYSIS_MODE):
+    """Runs analyze_file and returns {filename: category}, the shape classify_text_batch returns."""
+    return {os.path.basename(file_path): analyze_file(file_path, logger, image_mode)}
+
+
+def read_and_analyze_factory_files(directory, max_text_workers=MAX_TEXT_WORKERS,
+                                   max_vision_workers=MAX_VISION_WORKERS, max_audio_workers=MAX_AUDIO_WORKERS,
+                                   text_batch_mode=TEXT_BATCH_MODE, image_mode=IMAGE_ANALYSIS_MODE):
     logger = setup_logging()
     logger.info('Starting factory files analysis')
     
@@ -170,47 +360,82 @@ def read_and_analyze_factory_files(openai_client, directory):
         "people": [],
         "hardware": []
     }
-    
+
+    cache = load_classification_cache()
+    executors = {
+        '.txt': ThreadPoolExecutor(max_workers=max_text_workers, thread_name_prefix='text'),
+        '.png': ThreadPoolExecutor(max_workers=max_vision_workers, thread_name_prefix='vision'),
+        '.mp3': ThreadPoolExecutor(max_workers=max_audio_workers, thread_name_prefix='audio'),
+    }
+
     try:
-        files = [f for f in os.listdir(directory) if f.endswith(('.txt', '.png', '.mp3'))]
+        files = sorted(f for f in os.listdir(directory) if f.endswith(('.txt', '.png', '.mp3')))
         logger.info(f'Found {len(files)} files to analyze')
-        
+
+        analyses = {}
+        cache_keys = {}
+        futures = {}
+        text_reports = {}
         for filename in files:
-            logger.info(f'Processing file: {filename}')
             file_path = os.path.join(directory, filename)
-            
+            cache_key = classification_cache_key(file_sha256(file_path),
+                                                 analysis_mode(filename, image_mode, text_batch_mode))
+            if cache_key in cache:
+                logger.info(f'Using cached result for file: {filename} - Result: {cache[cache_key]["category"]}')
+                analyses[filename] = cache[cache_key]["category"]
+                continue
+            cache_keys[filename] = cache_key
+            logger.info(f'Processing file: {filename}')
+            if text_batch_mode and filename.endswith('.txt'):
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    text_reports[filename] = f.read()
+                continue
+            future = executors[os.path.splitext(filename)[1]].submit(
+                analyze_single_file, file_path, logger, image_mode
+            )
+            futures[future] = [filename]
+
+        if text_reports:
+            filenames = list(text_reports)
+            texts = [text_reports[filename] for filename in filenames]
+            for batch in iter_batches(texts, TEXT_BATCH_MAX_SIZE, TEXT_BATCH_MAX_TOKENS):
+                batch_reports = {filenames[i]: texts[i] for i in batch}
+                future = executors['.txt'].submit(classify_text_batch, batch_reports, logger)
+                futures[future] = list(batch_reports)
+
+        for future in as_completed(futures):
             try:
-                if filename.endswith('.txt'):
-                    logger.debug(f'Reading text file: {filename}')
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        analysis = analyze_content(openai_client, content, 'text', logger)
-                
-                elif filename.endswith('.png'):
-                    logger.debug(f'Reading image file: {filename}')
-                    base64_image = image_to_base64(file_path, logger)
-                    analysis = analyze_content(openai_client, base64_image, 'image', logger)
-                
-                elif filename.endswith('.mp3'):
-                    logger.debug(f'Reading audio file: {filename}')
-                    with open(file_path, 'rb') as f:
-                        content = f.read()
-                        analysis = analyze_content(openai_client, content, 'audio', logger)
-                
-                # Categorize based on analysis
-                if analysis.lower() == 'people':
-                    results['people'].append(filename)
-                elif analysis.lower() == 'hardware':
-                    results['hardware'].append(filename)
-                
-                logger.info(f'Successfully analyzed file: {filename} - Result: {analysis}')
-                
+                batch_analyses = future.result()
             except Exception as e:
-                logger.error(f'Error processing file {filename}: {str(e)}')
-    
+                logger.error(f'Error processing files {", ".join(futures[future])}: {str(e)}')
+                continue
+            failed = [filename for filename in futures[future] if filename not in batch_analyses]
+            if failed:
+                logger.error(f'Failed to analyze files: {", ".join(failed)}')
+            for filename, analysis in batch_analyses.items():
+                analyses[filename] = analysis
+                logger.info(f'Successfully analyzed file: {filename} - Result: {analysis}')
+                # Only answers that are a valid category are cached; anything else is retried next run
+                if analysis.strip().lower() in CATEGORIES:
+                    cache[cache_keys[filename]] = {"filename": filename, "category": analysis}
+                else:
+                    logger.warning(f'Not caching unexpected result for file: {filename} - Result: {analysis}')
+
+        # Categorize based on analysis, in filename order so reruns give identical output
+        for filename in sorted(analyses):
+            if analyses[filename].lower() == 'people':
+                results['people'].append(filename)
+            elif analyses[filename].lower() == 'hardware':
+                results['hardware'].append(filename)
+
     except Exception as e:
         logger.critical(f'Critical error during analysis: {str(e)}')
         raise
+
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=True)
+        save_classification_cache(cache)
     
     logger.info('Completed analysis of all files')
     logger.info(f"Files about people: {len(results['people'])}")
@@ -219,8 +444,86 @@ def read_and_analyze_factory_files(openai_client, directory):
     
     return results
 
+
+def benchmark_image_modes(directory):
+    """Runs the single-call and the chained image analysis on every PNG and compares them.
+
+    Returns a list of per-image rows with latency, token usage and category for both modes.
+    """
+    logger = setup_logging()
+    rows = []
+    for filename in sorted(f for f in os.listdir(directory) if f.endswith('.png')):
+        image_data_url = image_to_data_url(os.path.join(directory, filename), logger)
+        row = {"file": filename}
+        for mode in ('single', 'chain'):
+            with track_usage() as usage:
+                start_time = time.perf_counter()
+                category = analyze_content(image_data_url, 'image', logger, image_mode=mode)
+                row[mode] = {
+                    "latency_s": round(time.perf_counter() - start_time, 3),
+                    "calls": usage["calls"],
+                    "prompt_tokens": usage["prompt_tokens"],
+                    "completion_tokens": usage["completion_tokens"],
+                    "category": category,
+                }
+        rows.append(row)
+
+    print(f"{'file':<24}{'mode':<8}{'latency_s':>10}{'calls':>7}{'prompt':>8}{'compl.':>8}  category")
+    for row in rows:
+        for mode in ('single', 'chain'):
+            stats = row[mode]
+            print(f"{row['file']:<24}{mode:<8}{stats['latency_s']:>10.3f}{stats['calls']:>7}"
+                  f"{stats['prompt_tokens']:>8}{stats['completion_tokens']:>8}  {stats['category']}")
+    return rows
+
+
+def benchmark_text_modes(directory):
+    """Classifies every text report one per request and in batches and compares the categories.
+
+    Returns a dict with per-report categories for both modes, the reports where they disagree
+    and the calls and tokens each mode used.
+    """
+    logger = setup_logging()
+    reports = {}
+    for filename in sorted(f for f in os.listdir(directory) if f.endswith('.txt')):
+        with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+            reports[filename] = f.read()
+
+    categories = {}
+    usage_by_mode = {}
+    with track_usage() as usage:
+        categories['single'] = {filename: analyze_content(text, 'text', logger) for filename, text in reports.items()}
+    usage_by_mode['single'] = dict(usage)
+    with track_usage() as usage:
+        categories['batch'] = {}
+        filenames = list(reports)
+        for batch in iter_batches([reports[filename] for filename in filenames],
+                                  TEXT_BATCH_MAX_SIZE, TEXT_BATCH_MAX_TOKENS):
+            categories['batch'].update(classify_text_batch({filenames[i]: reports[filenames[i]] for i in batch}, logger))
+    usage_by_mode['batch'] = dict(usage)
+
+    disagreements = [
+        filename for filename in reports
+        if categories['single'].get(filename, '').strip().lower() != categories['batch'].get(filename, '').strip().lower()
+    ]
+    for mode in ('single', 'batch'):
+        stats = usage_by_mode[mode]
+        print(f"{mode:<8}calls={stats['calls']:<5}prompt={stats['prompt_tokens']:<8}completion={stats['completion_tokens']}")
+    print(f"{len(reports) - len(disagreements)}/{len(reports)} reports got the same category in both modes")
+    for filename in disagreements:
+        print(f"  {filename}: single={categories['single'].get(filename)} batch={categories['batch'].get(filename)}")
+    return {"categories": categories, "disagreements": disagreements, "usage": usage_by_mode}
+
+
 if __name__ == '__main__':
-    results = read_and_analyze_factory_files(openai_client, 'data/pliki_z_fabryki')
+    if '--benchmark-image-modes' in sys.argv:
+        benchmark_image_modes('data/pliki_z_fabryki')
+        sys.exit(0)
+    if '--benchmark-text-modes' in sys.argv:
+        benchmark_text_modes('data/pliki_z_fabryki')
+        sys.exit(0)
+
+    results = read_and_analyze_factory_files('data/pliki_z_fabryki')
 
     final_results = {
         "people": sorted(results["people"]),
@@ -1,74 +1,161 @@
 import requests
+import http_client
 from bs4 import BeautifulSoup
 import os
 from urllib.parse import urljoin
 import hashlib
 import mimetypes
-from openai import OpenAI
-import base64
 import json
+import tempfile
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
 from markdownify import markdownify as md
 
 from dotenv import load_dotenv
 
-from utils import post_json_data_to_url
+from image_prep import describe_savings, prepare_image, to_data_url
+from llm_cache import get_cache
+from llm_client import (DEFAULT_EMBEDDING_MODEL, build_messages, chat, count_tokens, embed_batch, estimate_tokens,
+                        prompt_cache_stats, track_usage, transcribe)
+from utils import load_json, post_json_data_to_url
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
+# Media items of a document downloaded and described or transcribed at once
+MAX_MEDIA_WORKERS = 8
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Retrieval settings for MarkdownAnalyzer.analyze_markdown(mode="rag")
+RAG_TOP_K = 4
+RAG_MAX_CHUNK_TOKENS = 400
+RAG_EMBEDDING_DIMENSIONS = 1024
+MEDIA_MARKERS = ("[Image description:", "[Audio Transcription:")
+
+# Translation settings for MarkdownAnalyzer.translate_markdown
+TRANSLATION_MODEL = "gpt-4o"
+TRANSLATION_PROMPT = "Translate the following markdown text from Polish to English. Preserve all markdown formatting."
+TRANSLATION_MAX_CHUNK_TOKENS = 1500
+TRANSLATION_WORKERS = 8
+TRANSLATION_CACHE_DIR = "cache/translations"
+
+ANSWER_PROMPT = "Provide a single-sentence answer to the question based on the markdown document provided. Be concise and direct."
+ANSWER_ALL_PROMPT = (
+    "Answer every question based on the markdown document provided. Give a single-sentence, concise and "
+    "direct answer per question. Respond with a JSON object mapping each question ID to its answer."
 )
 
 
 class DocumentToMarkdown:
 
-    def __init__(self, base_url, output_dir="indexed_content"):
+    def __init__(self, base_url, output_dir="indexed_content", max_workers=MAX_MEDIA_WORKERS):
         self.base_url = base_url
         self.output_dir = output_dir
+        self.max_workers = max_workers
         self.media_dir = os.path.join(output_dir, "media")
+        self.media_index_path = os.path.join(self.media_dir, "index.json")
         self.markdown_content = []
-        self.openai_client = openai_client
         self.create_directories()
-        
+        self.media_index = self.load_media_index()
+        self._media_lock = threading.Lock()
+        self._media_results = {}
+
     def create_directories(self):
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.media_dir, exist_ok=True)
-    
+
+    def load_media_index(self):
+        """Loads the url -> {filename, etag, last_modified} index of downloaded media."""
+        if os.path.exists(self.media_index_path):
+            with open(self.media_index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def save_media_index(self):
+        tmp_path = f"{self.media_index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.media_index, f, indent=2)
+        os.replace(tmp_path, self.media_index_path)
+
     def download_media(self, url, media_type):
-        response = requests.get(url)
-        if response.status_code == 200:
-            file_hash = hashlib.md5(url.encode()).hexdigest()
-            ext = mimetypes.guess_extension(response.headers['content-type'])
-            filename = f"{file_hash}{ext}"
+        """
+        Downloads a media file into the content-addressed media store.
+
+        Files are named by the SHA-256 of their content, so the same asset served from
+        different URLs is stored once. A URL seen before is revalidated with its ETag and
+        Last-Modified and not downloaded again while it is unchanged.
+
+        Returns:
+            str: Path of the stored file, or None if the download failed.
+        """
+        with self._media_lock:
+            entry = self.media_index.get(url)
+        cached_path = os.path.join(self.media_dir, entry['filename']) if entry else None
+        headers = {}
+        if cached_path and os.path.exists(cached_path):
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        with http_client.get(url, headers=headers, stream=True) as response:
+            if response.status_code != 304:
+                return self.store_media(url, response) if response.status_code == 200 else None
+            # Honour 304 only for a conditional request whose cached file is still there
+            if headers and os.path.exists(cached_path):
+                return cached_path
+
+        with http_client.get(url, stream=True) as response:
+            return self.store_media(url, response) if response.status_code == 200 else None
+
+    def store_media(self, url, response):
+        """Streams a 200 response into the media store and records it in the index; returns the path."""
+        # Stream to a temp file while hashing, then move it to its content-addressed name
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.media_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+            content_type = response.headers.get('content-type', '').split(';')[0].strip()
+            ext = mimetypes.guess_extension(content_type) or ''
+            filename = f"{digest.hexdigest()}{ext}"
             filepath = os.path.join(self.media_dir, filename)
-            
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-            return filepath
+            if os.path.exists(filepath):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._media_lock:
+            self.media_index[url] = {
+                'filename': filename,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+            self.save_media_index()
+        return filepath
 
     def transcribe_audio(self, audio_path):
         """Transcribes audio file using OpenAI API"""
         with open(audio_path, "rb") as audio_file:
-            transcript = self.openai_client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file
-            )
-        return transcript.text
+            return transcribe(audio_file)
 
     def get_image_description(self, image_path):
-        with open(image_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-            
-        response = self.openai_client.chat.completions.create(
+        prepared = prepare_image(image_path)
+        print(f"Prepared image {image_path}: {describe_savings(prepared)}")
+
+        response = chat(
             model="gpt-4o-mini",
+            cache=True,
             messages=[
                 {
                     "role": "user",
@@ -80,7 +167,7 @@ class DocumentToMarkdown:
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": to_data_url(prepared)
                             }
                         }
                     ]
@@ -90,35 +177,90 @@ class DocumentToMarkdown:
         )
         return response.choices[0].message.content
 
-    def process_document(self):
-        response = requests.get(self.base_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Process images before conversion
+    def collect_media(self, soup):
+        """Returns (tag, media_type, url) for every image and audio element of the document."""
+        media = []
         for img in soup.find_all('img'):
-            img_url = urljoin(self.base_url, img.get('src', ''))
-            saved_path = self.download_media(img_url, 'image')
-            if saved_path:
-                image_description = self.get_image_description(saved_path)
-                new_p = soup.new_tag('p')
-                new_p.string = f"[Image description: {image_description}]"
-                img.replace_with(new_p)
-        
-        # Process audio files
+            media.append((img, 'image', urljoin(self.base_url, img.get('src', ''))))
         for audio in soup.find_all('audio'):
             source = audio.find('source')
             if source:
-                audio_url = urljoin(self.base_url, source.get('src', ''))
-                saved_path = self.download_media(audio_url, 'audio')
-                if saved_path:
-                    transcription = self.transcribe_audio(saved_path)
-                    if transcription:
-                        # Create new p tag with transcription
-                        new_p = soup.new_tag('p')
-                        new_p.string = f"[Audio Transcription:\n {transcription}]"
-                        # Replace audio tag with transcription paragraph
-                        audio.replace_with(new_p)
-        
+                media.append((audio, 'audio', urljoin(self.base_url, source.get('src', ''))))
+        return media
+
+    def describe_media(self, saved_path, media_type):
+        """
+        Returns the description or transcription of a stored media file.
+
+        Results are kept next to the file, so each distinct asset is described once, even when
+        several URLs or threads point at it.
+        """
+        result_path = f"{saved_path}.txt"
+        with self._media_lock:
+            future = self._media_results.get(saved_path)
+            owner = future is None
+            if owner:
+                future = self._media_results[saved_path] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            if os.path.exists(result_path):
+                with open(result_path, 'r', encoding='utf-8') as f:
+                    result = f.read()
+            else:
+                if media_type == 'image':
+                    result = self.get_image_description(saved_path)
+                else:
+                    result = self.transcribe_audio(saved_path)
+                if result:
+                    with open(f"{result_path}.tmp", 'w', encoding='utf-8') as f:
+                        f.write(result)
+                    os.replace(f"{result_path}.tmp", result_path)
+        except BaseException as e:
+            future.set_exception(e)
+            with self._media_lock:
+                del self._media_results[saved_path]
+            raise
+        future.set_result(result)
+        return result
+
+    def process_media(self, url, media_type):
+        """Downloads one media item and returns the paragraph text that replaces it, or None."""
+        saved_path = self.download_media(url, media_type)
+        if not saved_path:
+            return None
+        result = self.describe_media(saved_path, media_type)
+        if not result:
+            return None
+        if media_type == 'image':
+            return f"[Image description: {result}]"
+        return f"[Audio Transcription:\n {result}]"
+
+    def process_document(self):
+        response = http_client.get(self.base_url)
+        soup = BeautifulSoup(response.text, 'html.parser')
+
+        # Phase 1: fetch, describe and transcribe every distinct media URL concurrently
+        media = self.collect_media(soup)
+        urls = {(url, media_type) for _, media_type, url in media}
+        replacements = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {key: executor.submit(self.process_media, *key) for key in urls}
+            for key, future in futures.items():
+                try:
+                    replacements[key] = future.result()
+                except Exception as e:
+                    print(f"Error processing {key[1]} {key[0]}: {e}")
+
+        # Phase 2: replace the media tags, in document order
+        for tag, media_type, url in media:
+            text = replacements.get((url, media_type))
+            if text:
+                new_p = soup.new_tag('p')
+                new_p.string = text
+                tag.replace_with(new_p)
+
         # Convert HTML to Markdown
         markdown_text = md(str(soup))
         self.markdown_content.append(markdown_text)
@@ -133,15 +275,156 @@ class DocumentToMarkdown:
             f.write(''.join(self.markdown_content))
 
 
+def split_markdown_blocks(markdown_content: str):
+    """
+    Splits markdown at blank lines outside fenced code blocks.
+
+    Returns:
+        tuple: (leading, blocks) where leading is any whitespace before the first block and
+            blocks is a list of (block, separator) pairs; joining them gives back the input.
+    """
+    leading, blocks, current, in_fence = '', [], [], False
+    for line in markdown_content.splitlines(keepends=True):
+        if line.lstrip().startswith(('```', '~~~')):
+            in_fence = not in_fence
+        if line.strip() or in_fence:
+            current.append(line)
+            continue
+        if current:
+            blocks.append([''.join(current), ''])
+            current = []
+        if blocks:
+            blocks[-1][1] += line
+        else:
+            leading += line
+    if current:
+        blocks.append([''.join(current), ''])
+
+    # Trailing newlines belong to the separator, so a block is exactly what gets translated
+    for pair in blocks:
+        text = pair[0].rstrip()
+        pair[1] = pair[0][len(text):] + pair[1]
+        pair[0] = text
+    return leading, [tuple(pair) for pair in blocks]
+
+
+def chunk_markdown_blocks(blocks: list, max_chunk_tokens: int = TRANSLATION_MAX_CHUNK_TOKENS) -> list:
+    """
+    Groups (block, separator) pairs into (chunk, separator) pairs for translation.
+
+    A chunk starts at every heading and whenever the next block would exceed max_chunk_tokens,
+    so an edit only changes the chunks of the section it is in.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for block, separator in blocks:
+        tokens = estimate_tokens(block)
+        if current and (block.startswith('#') or current_tokens + tokens > max_chunk_tokens):
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append((block, separator))
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return [
+        (''.join(block + separator for block, separator in chunk[:-1]) + chunk[-1][0], chunk[-1][1])
+        for chunk in chunks
+    ]
+
+
+def is_media_block(block: str) -> bool:
+    return block.lstrip().startswith(MEDIA_MARKERS)
+
+
+def chunk_markdown(markdown_content: str, max_chunk_tokens: int = RAG_MAX_CHUNK_TOKENS) -> list:
+    """
+    Splits markdown into retrieval chunks.
+
+    The document is cut at headings; sections longer than max_chunk_tokens are split further
+    at paragraph boundaries, with the section heading repeated on each piece. Image
+    descriptions and audio transcriptions become chunks of their own so they can be attached
+    to the chunks around them. Blocks come from split_markdown_blocks, so '#' lines inside
+    fenced code are never taken for headings.
+    """
+    sections = []
+    for block, _ in split_markdown_blocks(markdown_content)[1]:
+        block = block.strip()
+        if not block:
+            continue
+        if block.startswith('#') or not sections:
+            sections.append([])
+        sections[-1].append(block)
+
+    chunks = []
+    for blocks in sections:
+        prefix = []
+        if blocks and blocks[0].startswith('#'):
+            heading, _, rest = blocks[0].partition('\n')
+            prefix = [heading]
+            blocks = ([rest.strip()] if rest.strip() else []) + blocks[1:]
+            if not blocks:
+                chunks.append(heading)
+
+        buffer, buffer_tokens = [], 0
+        for block in blocks:
+            tokens = estimate_tokens(block)
+            if buffer and (is_media_block(block) or buffer_tokens + tokens > max_chunk_tokens):
+                chunks.append('\n\n'.join(prefix + buffer))
+                buffer, buffer_tokens = [], 0
+            if is_media_block(block):
+                chunks.append('\n\n'.join(prefix + [block]))
+                continue
+            buffer.append(block)
+            buffer_tokens += tokens
+        if buffer:
+            chunks.append('\n\n'.join(prefix + buffer))
+    return chunks
+
+
+class ChunkIndex:
+    """
+    Local embedding index over document chunks.
+
+    Vectors come from embed_batch, so chunks and questions that were embedded before are read
+    from the on-disk vector cache instead of being sent to the API again.
+    """
+
+    def __init__(self, chunks: list, model: str = DEFAULT_EMBEDDING_MODEL,
+                 dimensions: int = RAG_EMBEDDING_DIMENSIONS):
+        self.chunks = chunks
+        self.model = model
+        self.dimensions = dimensions
+        self.vectors = self._normalize(embed_batch(chunks, model=model, dimensions=dimensions))
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def search(self, query: str, top_k: int = RAG_TOP_K) -> list:
+        """Returns the indices of the top_k chunks most similar to the query."""
+        query_vector = self._normalize(embed_batch([query], model=self.model, dimensions=self.dimensions))[0]
+        scores = self.vectors @ query_vector
+        return [int(i) for i in np.argsort(-scores)[:top_k]]
+
+    def context(self, indices: list) -> str:
+        """Joins the selected chunks in document order, adding the media chunks next to them."""
+        selected = set(indices)
+        for i in indices:
+            for neighbour in (i - 1, i + 1):
+                if 0 <= neighbour < len(self.chunks) and is_media_block(self.chunks[neighbour].split('\n\n')[-1]):
+                    selected.add(neighbour)
+        return '\n\n'.join(self.chunks[i] for i in sorted(selected))
+
+
 class MarkdownAnalyzer:
     def __init__(self):
-        self.client = openai_client
         self.questions_url = f"{CENTRALA_BASE_URL}/data/{AIDEVS_MY_APIKEY}/arxiv.txt"
+        self.report = []
     
     def fetch_questions(self):
         """Fetches and parses questions from URL into a dictionary."""
         try:
-            response = requests.get(self.questions_url)
+            response = http_client.get(self.questions_url)
             response.raise_for_status()
             questions_text = response.text
             
@@ -155,51 +438,201 @@ class MarkdownAnalyzer:
         except requests.RequestException as e:
             raise Exception(f"Error while fetching questions: {e}")
     
+    def translate_chunk(self, chunk: str) -> tuple:
+        """
+        Translates one markdown chunk, reusing the stored translation of identical content.
+
+        Returns:
+            tuple: (translation, from_cache).
+        """
+        key = hashlib.sha256(f"{TRANSLATION_MODEL}\n{TRANSLATION_PROMPT}\n{chunk}".encode('utf-8')).hexdigest()
+        cache_path = os.path.join(TRANSLATION_CACHE_DIR, f"{key}.md")
+        if os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return f.read(), True
+
+        response = chat(
+            model=TRANSLATION_MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": TRANSLATION_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": chunk
+                }
+            ]
+        )
+        translation = response.choices[0].message.content.strip()
+
+        os.makedirs(TRANSLATION_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=TRANSLATION_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(translation)
+        os.replace(tmp_path, cache_path)
+        return translation, False
+
     def translate_markdown(self, markdown_content: str) -> str:
-        """Translates markdown content from Polish to English."""
+        """
+        Translates markdown content from Polish to English.
+
+        The document is split at block boundaries into chunks that are translated
+        concurrently and reassembled in order with the original spacing. Translations are
+        stored by content hash, so a re-run only translates chunks that changed.
+        """
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Translate the following markdown text from Polish to English. Preserve all markdown formatting."
-                    },
-                    {
-                        "role": "user",
-                        "content": markdown_content
-                    }
-                ]
-            )
-            return response.choices[0].message.content
+            leading, blocks = split_markdown_blocks(markdown_content)
+            chunks = chunk_markdown_blocks(blocks)
+            distinct = list(dict.fromkeys(chunk for chunk, _ in chunks))
+            with ThreadPoolExecutor(max_workers=TRANSLATION_WORKERS) as executor:
+                translations = dict(zip(distinct, executor.map(self.translate_chunk, distinct)))
+            cached = sum(1 for _, from_cache in translations.values() if from_cache)
+            print(f"Translation: {len(distinct)} chunks, {cached} from cache, {len(distinct) - cached} translated")
+            return leading + ''.join(translations[chunk][0] + separator for chunk, separator in chunks)
         except Exception as e:
             raise Exception(f"Translation error: {e}")
 
-    def analyze_markdown(self, markdown_content: str):
-        """Analyzes markdown document and returns answers in specified format."""
+    def answer_question(self, document: str, question: str):
+        """
+        Answers one question from the given document.
+
+        Returns:
+            tuple: (answer, stats) where stats holds the prompt tokens reported by the API
+                (0 for cached responses), the estimated document tokens and the latency.
+        """
+        start = time.perf_counter()
+        with track_usage() as usage:
+            response = chat(
+                model="gpt-4o",
+                cache=True,
+                # The document is the shared prefix of every question's prompt
+                messages=build_messages(ANSWER_PROMPT, context=f"Document:\n{document}",
+                                        query=f"Question:\n{question}")
+            )
+        stats = {
+            "prompt_tokens": usage["prompt_tokens"],
+            "cached_tokens": usage["cached_tokens"],
+            "document_tokens": count_tokens(document, "gpt-4o"),
+            "latency_s": time.perf_counter() - start,
+        }
+        return response.choices[0].message.content.strip(), stats
+
+    def answer_all_questions(self, document: str, questions_dict: dict):
+        """
+        Answers every question in one structured-output call, so the document is sent once.
+
+        The response must be an object with one string answer per question ID. IDs that are
+        missing or have an empty answer are re-asked one by one with answer_question.
+
+        Returns:
+            tuple: (answers, stats) where stats covers the single call plus the re-asks.
+        """
+        schema = {
+            "type": "object",
+            "properties": {question_id: {"type": "string"} for question_id in questions_dict},
+            "required": list(questions_dict),
+            "additionalProperties": False,
+        }
+        questions = "\n".join(f"{question_id}: {question}" for question_id, question in questions_dict.items())
+
+        start = time.perf_counter()
+        with track_usage() as usage:
+            response = chat(
+                model="gpt-4o",
+                cache=True,
+                messages=build_messages(ANSWER_ALL_PROMPT, context=f"Document:\n{document}",
+                                        query=f"Questions:\n{questions}"),
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {"name": "answers", "strict": True, "schema": schema},
+                },
+            )
+        stats = {
+            "prompt_tokens": usage["prompt_tokens"],
+            "cached_tokens": usage["cached_tokens"],
+            "document_tokens": count_tokens(document, "gpt-4o"),
+            "latency_s": time.perf_counter() - start,
+            "reasked": 0,
+        }
+
+        answers = {}
+        try:
+            result = load_json(response.choices[0].message.content)
+        except ValueError as e:
+            print(f"Invalid structured answer, re-asking all questions: {e}")
+            result = {}
+        if isinstance(result, dict):
+            for question_id in questions_dict:
+                answer = result.get(question_id)
+                if isinstance(answer, str) and answer.strip():
+                    answers[question_id] = answer.strip()
+
+        for question_id, question in questions_dict.items():
+            if question_id not in answers:
+                print(f"No answer for {question_id} in the structured response, asking it separately")
+                answers[question_id], reask_stats = self.answer_question(document, question)
+                stats["prompt_tokens"] += reask_stats["prompt_tokens"]
+                stats["cached_tokens"] += reask_stats["cached_tokens"]
+                stats["latency_s"] += reask_stats["latency_s"]
+                stats["reasked"] += 1
+        return answers, stats
+
+    def analyze_markdown(self, markdown_content: str, mode: str = "full", top_k: int = RAG_TOP_K,
+                         single_pass: bool = False):
+        """
+        Analyzes markdown document and returns answers in specified format.
+
+        Args:
+            markdown_content (str): The Polish markdown document.
+            mode (str): 'full' sends the whole document with every question, 'rag' only the
+                top_k most relevant chunks and 'compare' runs both and answers from 'rag'.
+            top_k (int): Number of chunks retrieved per question.
+            single_pass (bool): Answer all questions in one call (see answer_all_questions);
+                in 'rag' mode the context is the union of every question's chunks.
+
+        Returns:
+            dict: question_id -> answer. Per-question tokens and latency of each mode are
+                collected in self.report (see print_report).
+        """
+        if mode not in ("full", "rag", "compare"):
+            raise ValueError("mode must be 'full', 'rag' or 'compare'.")
+        if single_pass and mode == "compare":
+            raise ValueError("single_pass supports the 'full' and 'rag' modes.")
         questions_dict = self.fetch_questions()
         print(questions_dict)
         answers = {}
         
         # Translate content before analysis
         translated_content = self.translate_markdown(markdown_content)
+        index = ChunkIndex(chunk_markdown(translated_content)) if mode != "full" else None
         
         try:
+            if single_pass:
+                if index is None:
+                    context = translated_content
+                else:
+                    context = index.context(sorted({
+                        i for question in questions_dict.values() for i in index.search(question, top_k)
+                    }))
+                answers, stats = self.answer_all_questions(context, questions_dict)
+                self.report.append({"question_id": "all",
+                                    "baseline_document_tokens": count_tokens(translated_content, "gpt-4o"),
+                                    "single": stats})
+                for question_id, question in questions_dict.items():
+                    print("Question:", question)
+                    print("Answer:", answers[question_id])
+                return answers
+
             for question_id, question in questions_dict.items():
-                response = self.client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": "Provide a single-sentence answer to the question based on the markdown document provided. Be concise and direct."
-                        },
-                        {
-                            "role": "user", 
-                            "content": f"Document:\n{translated_content}\n\nQuestion:\n{question}"
-                        }
-                    ]
-                )
-                answer = response.choices[0].message.content.strip()
+                row = {"question_id": question_id,
+                       "baseline_document_tokens": count_tokens(translated_content, "gpt-4o")}
+                if mode != "rag":
+                    answer, row["full"] = self.answer_question(translated_content, question)
+                if index is not None:
+                    context = index.context(index.search(question, top_k))
+                    answer, row["rag"] = self.answer_question(context, question)
+                self.report.append(row)
                 print("Question:", question)
                 print("Answer:", answer)
                 answers[question_id] = answer
@@ -208,7 +641,19 @@ class MarkdownAnalyzer:
             
         except Exception as e:
             raise Exception(f"Error during analysis: {e}")
-    
+
+    def print_report(self):
+        """Prints document tokens, API prompt tokens and latency per question for each mode run."""
+        for row in self.report:
+            parts = [f"{row['question_id']}: baseline document ~{row['baseline_document_tokens']} tokens"]
+            for mode in ("full", "rag", "single"):
+                if mode in row:
+                    stats = row[mode]
+                    parts.append(f"{mode}: document ~{stats['document_tokens']} tokens, "
+                                 f"prompt {stats['prompt_tokens']} tokens ({stats['cached_tokens']} cached), "
+                                 f"{stats['latency_s'] * 1000:.0f} ms")
+            print(" | ".join(parts))
+
     def save_results(self, results, output_file: str = "answers.json"):
         """Saves results to JSON file."""
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -226,10 +671,14 @@ if __name__ == "__main__":
     
     # Analyze content
     analyzer = MarkdownAnalyzer()
-    results = analyzer.analyze_markdown(markdown_content)
+    # Pass mode="rag" to answer from the retrieved chunks only
+    results = analyzer.analyze_markdown(markdown_content, mode="full")
     analyzer.save_results(results)
+    analyzer.print_report()
 
     print(results)
+    print("llm cache:", get_cache().stats())
+    print("prompt cache:", prompt_cache_stats())
 
     payload = {
         "task": "arxiv",
@@ -1,32 +1,38 @@
+import hashlib
+import json
 import os
+import re
 
 from dotenv import load_dotenv
-from openai import OpenAI
 
-from utils import post_json_data_to_url, read_txt_files
+from llm_cache import get_cache
+from llm_client import chat
+from utils import post_json_data_to_url, read_txt_files_parallel
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
+# Names extracted by the LLM so far, keyed by the SHA-256 of the file content
+NAME_INDEX_FILE = "cache/person_names.json"
+NO_NAME_FOUND = "NO_NAME_FOUND"
+# Case endings of Polish first names and surnames (Ragowski, Ragowskiego, Ragowskim, ...)
+NAME_ENDINGS = "iego|iemu|ego|emu|owi|iej|iem|ej|ie|im|ym|em|om|ą|ę|a|e|i|o|u|y"
+# Shortest stem matched with an ending; shorter words are matched exactly
+MIN_STEM_LENGTH = 4
 
 
-reports = read_txt_files("assignments/data/pliki_z_fabryki")
-facts = read_txt_files("assignments/data/pliki_z_fabryki/facts")
+reports = {txt_file.filename: txt_file.content
+           for txt_file in read_txt_files_parallel("assignments/data/pliki_z_fabryki", ordered=True)}
+facts = {txt_file.filename: txt_file.content
+         for txt_file in read_txt_files_parallel("assignments/data/pliki_z_fabryki/facts", ordered=True)}
 
 
 def extract_person_name(text_content: str) -> str:
-    response = openai_client.chat.completions.create(
+    response = chat(
             model="gpt-4o-mini",
+            cache=True,
             messages=[
                 {
                     "role": "system",
@@ -43,6 +49,90 @@ def extract_person_name(text_content: str) -> str:
     return response.choices[0].message.content.strip()
 
 
+def load_name_index() -> dict:
+    if os.path.exists(NAME_INDEX_FILE):
+        with open(NAME_INDEX_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_name_index(name_index: dict):
+    os.makedirs(os.path.dirname(NAME_INDEX_FILE), exist_ok=True)
+    tmp_path = f"{NAME_INDEX_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(name_index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, NAME_INDEX_FILE)
+
+
+def name_pattern(name: str):
+    """
+    Compiles a pattern matching a known 'First Last' name in any grammatical case.
+
+    Polish names inflect at the end (Ragowski, Ragowskiego), so each word is matched by its
+    stem (the word without a final vowel) followed by one of NAME_ENDINGS. Only known endings
+    are accepted, so 'Barba' does not match 'Barbara'.
+    """
+    parts = []
+    for word in name.split():
+        stem = word[:-1] if word[-1].lower() in 'aeiouy' else word
+        if len(stem) < MIN_STEM_LENGTH:
+            parts.append(re.escape(word))
+        else:
+            parts.append(f'{re.escape(stem)}(?:{NAME_ENDINGS})?')
+    return re.compile(r'\b' + r'\s+'.join(parts) + r'\b')
+
+
+def leading_sentence(text_content: str) -> str:
+    """Returns the first sentence (or first line) of a text."""
+    return re.split(r'(?<=[.!?])\s+|\n', text_content.strip(), maxsplit=1)[0]
+
+
+def match_known_person(text_content: str, known_people: dict):
+    """
+    Returns the known person the text is about, or None if that is not clear.
+
+    A text mentioning someone is not necessarily about them, so only the leading sentence,
+    where these reports and facts name their subject, is searched, and it has to name
+    exactly one known person.
+    """
+    sentence = leading_sentence(text_content)
+    found = [name for name, pattern in known_people.items() if pattern.search(sentence)]
+    return found[0] if len(found) == 1 else None
+
+
+def find_person_name(text_content: str, name_index: dict, known_people: dict, stats: dict) -> str:
+    """
+    Resolves the person a text is about, asking the LLM only when the local lookups fail.
+
+    The persisted index of LLM answers is checked first by file hash, then the text is
+    matched against the people already known. Names returned by the LLM are added to both;
+    matcher hits are cheap to recompute and are not persisted.
+    """
+    key = hashlib.sha256(text_content.encode('utf-8')).hexdigest()
+    if key in name_index:
+        stats["index"] += 1
+        return name_index[key]
+
+    person_name = match_known_person(text_content, known_people)
+    if person_name:
+        stats["matcher"] += 1
+        return person_name
+
+    person_name = extract_person_name(text_content)
+    stats["llm"] += 1
+    if person_name != NO_NAME_FOUND and len(person_name.split()) >= 2:
+        known_people.setdefault(person_name, name_pattern(person_name))
+    name_index[key] = person_name
+    return person_name
+
+
+name_index = load_name_index()
+known_people = {
+    name: name_pattern(name) for name in set(name_index.values())
+    if name != NO_NAME_FOUND and len(name.split()) >= 2
+}
+name_stats = {"index": 0, "matcher": 0, "llm": 0}
+
 updated_facts = {}
 
 for fact_id, fact_content in facts.items():
@@ -50,10 +140,13 @@ for fact_id, fact_content in facts.items():
         updated_facts[fact_id] = fact_content
         continue
         
-    person_name = extract_person_name(fact_content)
+    person_name = find_person_name(fact_content, name_index, known_people, name_stats)
     
-    if person_name == "NO_NAME_FOUND":
+    if person_name == NO_NAME_FOUND:
         updated_facts[fact_id] = fact_content
+    elif person_name in updated_facts:
+        # Several fact files can describe the same person; keep all of them
+        updated_facts[person_name] += f"\n\n{fact_content}"
     else:
         updated_facts[person_name] = fact_content
 
@@ -78,14 +171,15 @@ EXAMPLES:
 
 results = {}
 for report_id, report_content in reports.items():
-    person_name = extract_person_name(report_content)
+    person_name = find_person_name(report_content, name_index, known_people, name_stats)
     print(report_id, 'person_name: ', person_name)
     person_facts = updated_facts.get(person_name, "")
 
     report_and_facts = f"Report name: {report_id}\n\nReport: {report_content}\n\nFacts: {person_facts}"
 
-    response = openai_client.chat.completions.create(
+    response = chat(
             model="gpt-4o",
+            cache=True,
             messages=[
                 {
                     "role": "system",
@@ -100,7 +194,11 @@ for report_id, report_content in reports.items():
 
     results[report_id] = response.choices[0].message.content.strip()
 
+save_name_index(name_index)
+
 print('results: ', results)
+print('person name lookups: ', name_stats)
+print('llm cache: ', get_cache().stats())
 
 payload = {
     "task": "dokumenty",
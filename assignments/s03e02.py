@@ -1,24 +1,16 @@
 from qdrant_client import QdrantClient
 from qdrant_client.models import VectorParams, Distance, PointStruct
-from openai import OpenAI
-from utils import read_txt_files, post_json_data_to_url
+from llm_client import embed_batch
+from utils import post_json_data_to_url, read_txt_files_parallel
 from dotenv import load_dotenv
 import os
 import uuid
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
 
 # Initialize Qdrant client
 qdrant_client = QdrantClient(host="localhost", port=6333)
@@ -31,19 +23,27 @@ if not qdrant_client.collection_exists(collection_name):
         vectors_config=VectorParams(size=1024, distance=Distance.COSINE),
     )
 
-# Function to get embedding from OpenAI
+# Function to get embeddings from OpenAI, batched and cached on disk
+def get_embeddings(texts, size, model="text-embedding-3-large"):
+    texts = [txt.replace("\n", " ") for txt in texts]
+    return embed_batch(texts, model=model, dimensions=size).tolist()
+
+
 def get_embedding(txt, size, model="text-embedding-3-large"):
-    txt = txt.replace("\n", " ")
-    return openai_client.embeddings.create(input=[txt], model=model, dimensions=size).data[0].embedding
+    return get_embeddings([txt], size, model=model)[0]
 
 
-weapons_tests = read_txt_files("assignments/data/pliki_z_fabryki/do-not-share")
+weapons_tests = {
+    txt_file.filename: txt_file.content
+    for txt_file in read_txt_files_parallel("assignments/data/pliki_z_fabryki/do-not-share", ordered=True)
+}
+weapons_tests_vectors = get_embeddings(list(weapons_tests.values()), 1024)
 
 weapons_tests_embeddings = []
-for filename, test_text in weapons_tests.items():
+for (filename, test_text), vector in zip(weapons_tests.items(), weapons_tests_vectors):
     weapons_tests_embeddings.append({
         "id": str(uuid.uuid4()),
-        "vector": get_embedding(test_text, 1024),
+        "vector": vector,
         "payload": {
             "text": test_text,
             "filename": filename
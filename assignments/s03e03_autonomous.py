@@ -1,28 +1,14 @@
-import requests
 from dotenv import load_dotenv
 import os
-from openai import OpenAI
 
-from utils import post_json_data_to_url
+from llm_client import chat
+from utils import get_response_from_url, post_json_data_to_url
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
-
-
-def get_response_from_url(url, input_json):
-    response = requests.get(url, json=input_json)
-    return response.json()
 
 
 def query_structure(sql_query_text):
@@ -68,7 +54,7 @@ while (i < 10) and ("OBJECTIVE_QUERY" not in new_query):
 
     print(prompt)
 
-    response = openai_client.chat.completions.create(
+    response = chat(
         model="gpt-4o",
         messages=[
             {
@@ -1,36 +1,28 @@
 import json
 from json import JSONDecodeError
 
-import requests
+import http_client
 from dotenv import load_dotenv
 import os
 
-from openai import OpenAI
 
+from llm_client import chat
 from utils import post_json_data_to_url
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
 
 
 barbara_url = f"{CENTRALA_BASE_URL}/dane/barbara.txt"
-barbara_response = requests.get(barbara_url)
+barbara_response = http_client.get(barbara_url)
 note_about_barbara = barbara_response.text
 
 def get_people_from_api(person_name: str):
     people_url = f"{CENTRALA_BASE_URL}/people"
-    people_response = requests.get(people_url, json={
+    people_response = http_client.get(people_url, json={
         "query": person_name,
         "apikey": AIDEVS_MY_APIKEY
     })
@@ -38,7 +30,7 @@ def get_people_from_api(person_name: str):
 
 def get_places_from_api(place_name: str):
     places_url = f"{CENTRALA_BASE_URL}/places"
-    places_response = requests.get(places_url, json={
+    places_response = http_client.get(places_url, json={
         "query": place_name,
         "apikey": AIDEVS_MY_APIKEY
     })
@@ -131,7 +123,7 @@ if __name__ == "__main__":
     while i < 30:
         print(i)
         i += 1
-        openai_response = openai_client.chat.completions.create(
+        openai_response = chat(
             model="gpt-4o",
             messages=[
                 {
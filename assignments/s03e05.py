@@ -1,33 +1,21 @@
-import requests
+import asyncio
+
+import http_client
 from dotenv import load_dotenv
 import os
-from openai import OpenAI
 from neo4j import GraphDatabase
 
-from utils import post_json_data_to_url
+from utils import async_get_response_from_url, post_json_data_to_url
 
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASS = os.getenv("NEO4J_PASS")
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
-
-
-def get_response_from_url(url, input_json):
-    response = requests.get(url, json=input_json)
-    return response.json()
 
 
 def query_structure(sql_query_text):
@@ -38,6 +26,17 @@ def query_structure(sql_query_text):
 }
 
 
+async def fetch_tables(queries):
+    """Runs the given queries against the apidb endpoint concurrently, keeping their order."""
+    try:
+        return await asyncio.gather(*[
+            async_get_response_from_url(f"{CENTRALA_BASE_URL}/apidb", query_structure(query))
+            for query in queries
+        ])
+    finally:
+        await http_client.close_async_client()
+
+
 def load_users_to_neo4j(uri, auth, users):
     """Load users data into Neo4j database as User nodes.
     
@@ -140,15 +139,12 @@ def find_shortest_path(uri, auth, from_username, to_username):
 
 
 if __name__ == "__main__":
-    users = get_response_from_url(
-        f"{CENTRALA_BASE_URL}/apidb",
-        query_structure("select * from users ")
-    )["reply"]
-
-    connections = get_response_from_url(
-        f"{CENTRALA_BASE_URL}/apidb",
-        query_structure("select * from connections ")
-    )["reply"]
+    users_response, connections_response = asyncio.run(fetch_tables([
+        "select * from users ",
+        "select * from connections ",
+    ]))
+    users = users_response["reply"]
+    connections = connections_response["reply"]
 
     print(users)
     print(connections)
@@ -4,26 +4,19 @@ import re
 import requests
 from dotenv import load_dotenv
 import os
-from openai import OpenAI
 
+from image_prep import describe_savings, prepare_image_url, to_data_url
+from llm_client import chat
 from utils import post_json_data_to_url
 
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 
 data_path = "assignments/data"
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
 
 if not os.path.exists(f"{data_path}/start_response.txt"):
     start_payload = {
@@ -51,8 +44,15 @@ photos_names = [
 ]
 
 
+def prepare_photo(photo_url: str) -> str:
+    """Downloads, downscales and re-encodes a photo, returning it as a data URL."""
+    prepared = prepare_image_url(photo_url)
+    print(f"Prepared photo {photo_url}: {describe_savings(prepared)}")
+    return to_data_url(prepared)
+
+
 def decide_how_to_fix_photo(photo_name: str, photos_url=PHOTOS_URL):
-    photo_url = f"{photos_url}/{photo_name}"
+    photo_url = prepare_photo(f"{photos_url}/{photo_name}")
     photo_fixer_prompt = """
     You are a photo analyzer. You are given a photo, and you need to decide if it presents a person. If the photo is damaged or unclear, you need to decide how to fix it. Make sure to make as few mistakes as possible when selecting the appropriate command.
 
@@ -86,7 +86,7 @@ def decide_how_to_fix_photo(photo_name: str, photos_url=PHOTOS_URL):
     }
     </output_format>
     """
-    response = openai_client.chat.completions.create(
+    response = chat(
         model="gpt-4o-mini",
         messages=[
             {
@@ -174,7 +174,7 @@ describe_person_query_content = [
 ]
 
 for photo_name in clean_photos_names:
-    photo_url = f"{PHOTOS_URL}/{photo_name}"
+    photo_url = prepare_photo(f"{PHOTOS_URL}/{photo_name}")
     describe_person_query_content.append({
         "type": "image_url",
         "image_url": {
@@ -182,7 +182,7 @@ for photo_name in clean_photos_names:
         },
     })
 
-describe_person_response = openai_client.chat.completions.create(
+describe_person_response = chat(
     model="gpt-4o-mini",
     messages=[
         {
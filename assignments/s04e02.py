@@ -1,26 +1,34 @@
+import asyncio
+import hashlib
 import json
 import os
+import random
+import shutil
+import sys
+import tempfile
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
 
+from llm_batch import LocalBatchServer, run_batch
+from llm_client import LLM_MAX_RETRIES, async_chat, chat, count_tokens, create_async_client
 from utils import post_json_data_to_url
 
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 
 data_path = "assignments/data"
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
+# Examples held in memory per split while building the dataset; larger inputs are shuffled on disk
+DATASET_BUFFER_LINES = 100_000
+
+# Requests in flight at once when evaluating verify.txt
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "16"))
+# Completion budget of every assessment request
+MAX_TOKENS = 300
+
 
 def generate_message(sample: str, is_correct: bool) -> str:
     return json.dumps({
@@ -32,55 +40,297 @@ def generate_message(sample: str, is_correct: bool) -> str:
     })
 
 
-def prepare_training_data(input_file_path: str, output_file_path: str, is_correct: bool):
-    with open(input_file_path, 'r') as input_file:
-        with open(output_file_path, 'a') as output_file:
-            for line in input_file:
-                json_line = generate_message(line.strip(), is_correct)
-                output_file.write(json_line + '\n')
+def message_template(is_correct: bool):
+    """Returns (prefix, suffix) so that prefix + json.dumps(sample) + suffix == generate_message(sample, is_correct)."""
+    placeholder = "\0sample\0"
+    prefix, suffix = generate_message(placeholder, is_correct).split(json.dumps(placeholder))
+    return prefix, suffix
+
+
+def _write_run(lines: list, rng: random.Random, directory: str) -> tuple:
+    rng.shuffle(lines)
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".jsonl")
+    with os.fdopen(fd, 'w', encoding='utf-8') as run_file:
+        run_file.writelines(lines)
+    return path, len(lines)
+
+
+def _merge_runs(runs: list, output_file, rng: random.Random):
+    # Drawing each next line from a run with probability proportional to its remaining lines
+    # turns independently shuffled runs into a uniform shuffle of the whole split
+    files = [open(path, 'r', encoding='utf-8') for path, _ in runs]
+    remaining = [count for _, count in runs]
+    total = sum(remaining)
+    try:
+        while total:
+            pick = rng.randrange(total)
+            index = 0
+            while pick >= remaining[index]:
+                pick -= remaining[index]
+                index += 1
+            output_file.write(files[index].readline())
+            remaining[index] -= 1
+            total -= 1
+    finally:
+        for run_file in files:
+            run_file.close()
+
+
+def build_training_dataset(sources: dict, train_path: str, validation_path: str,
+                           validation_fraction: float = 0.1, seed: int = 42,
+                           max_example_tokens: int = None, buffer_lines: int = DATASET_BUFFER_LINES,
+                           model: str = "gpt-4o-mini") -> dict:
+    """
+    Builds fresh train and validation JSONL files from sample files, streaming the input.
+
+    Samples are deduplicated by hash, assigned to a split by their hash (so a sample lands in
+    the same split on every run), shuffled with a seeded external shuffle and written to temp
+    files that atomically replace the outputs. Running it twice gives identical files.
+
+    Args:
+        sources (dict): Sample file path -> is_correct label. Earlier files win on duplicates.
+        train_path (str): Output path of the training set.
+        validation_path (str): Output path of the validation set.
+        validation_fraction (float): Share of samples that go to the validation set.
+        seed (int): Shuffle seed.
+        max_example_tokens (int, optional): Examples with more tokens are skipped.
+        buffer_lines (int): Examples per split held in memory before spilling a shuffled run to disk.
+        model (str): Model whose tokenizer is used for counting.
+
+    Returns:
+        dict: Counts of read, duplicate and skipped samples, and examples and tokens per split.
+    """
+    rng = random.Random(seed)
+    seen = set()
+    stats = {"read": 0, "duplicates": 0, "too_long": 0, "max_example_tokens": 0}
+    outputs = {"train": train_path, "validation": validation_path}
+    buffers = {split: [] for split in outputs}
+    runs = {split: [] for split in outputs}
+    for split in outputs:
+        stats[split] = 0
+        stats[f"{split}_tokens"] = 0
+
+    output_dir = os.path.dirname(os.path.abspath(train_path))
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(validation_path)), exist_ok=True)
+    work_dir = tempfile.mkdtemp(dir=output_dir, prefix=".dataset-")
+    try:
+        for input_file_path, is_correct in sources.items():
+            prefix, suffix = message_template(is_correct)
+            # Every example shares the system and assistant messages, so they are counted once
+            fixed_tokens = count_tokens("Decide if sample is correct", model) + count_tokens(str(is_correct), model)
+            with open(input_file_path, 'r', encoding='utf-8') as input_file:
+                for line in input_file:
+                    sample = line.strip()
+                    if not sample:
+                        continue
+                    stats["read"] += 1
+                    digest = hashlib.blake2b(sample.encode('utf-8'), digest_size=8).digest()
+                    if digest in seen:
+                        stats["duplicates"] += 1
+                        continue
+                    seen.add(digest)
+
+                    tokens = fixed_tokens + count_tokens(sample, model)
+                    if max_example_tokens and tokens > max_example_tokens:
+                        stats["too_long"] += 1
+                        continue
+                    stats["max_example_tokens"] = max(stats["max_example_tokens"], tokens)
+
+                    split = "validation" if int.from_bytes(digest, 'big') / 2 ** 64 < validation_fraction else "train"
+                    stats[split] += 1
+                    stats[f"{split}_tokens"] += tokens
+                    buffers[split].append(prefix + json.dumps(sample) + suffix + '\n')
+                    if len(buffers[split]) >= buffer_lines:
+                        runs[split].append(_write_run(buffers[split], rng, work_dir))
+                        buffers[split] = []
+
+        for split, output_path in outputs.items():
+            if buffers[split]:
+                runs[split].append(_write_run(buffers[split], rng, work_dir))
+                buffers[split] = []
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_path)), suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as output_file:
+                _merge_runs(runs[split], output_file, rng)
+            os.replace(tmp_path, output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return stats
+
+
+def assessment_messages(content: str) -> list:
+    return [
+        {
+            "role": "system",
+            "content": "Decide if sample is correct",
+        },
+        {
+            "role": "user",
+            "content": content,
+        },
+    ]
 
 
 def assess_data(model_name: str, content: str):
-    response = openai_client.chat.completions.create(
+    response = chat(
         model=model_name,
-        messages=[
-            {
-                "role": "system",
-                "content": "Decide if sample is correct",
-            },
-            {
-                "role": "user",
-                "content": content,
-            },
-        ],
-        max_tokens=300,
+        messages=assessment_messages(content),
+        max_tokens=MAX_TOKENS,
     )
     return response.choices[0].message.content.strip()
 
 
-if __name__ == '__main__':
-    prepare_training_data(
-        input_file_path="data/lab_data/correct.txt",
-        output_file_path="data/lab_data/training_dataset.jsonl",
-        is_correct=True
-    )
+def assess_data_batch(model_name: str, samples: dict, backend=None, **kwargs) -> dict:
+    """
+    Assesses all samples in one batch job instead of one request per sample.
+
+    Args:
+        model_name (str): Model to assess with.
+        samples (dict): line_id -> sample content.
+        backend: Batch backend passed to run_batch (OpenAI by default).
+        **kwargs: Passed through to run_batch (poll_interval, timeout...).
 
-    prepare_training_data(
-        input_file_path="data/lab_data/incorrect.txt",
-        output_file_path="data/lab_data/training_dataset.jsonl",
-        is_correct=False
+    Returns:
+        dict: line_id -> model answer. Samples that failed in the batch are assessed with
+            assess_data instead.
+    """
+    requests = {
+        line_id: {"model": model_name, "messages": assessment_messages(content), "max_tokens": MAX_TOKENS}
+        for line_id, content in samples.items()
+    }
+    results, errors = run_batch(requests, backend=backend, name="s04e02_verify", **kwargs)
+
+    answers = {}
+    for line_id, content in samples.items():
+        body = results.get(line_id)
+        if body is None:
+            print(f"Batch failed for {line_id} ({errors.get(line_id)}), assessing it directly")
+            answers[line_id] = assess_data(model_name, content)
+        else:
+            answers[line_id] = body["choices"][0]["message"]["content"].strip()
+    return answers
+
+
+async def evaluate_async(model_name: str, samples: dict, concurrency: int = EVAL_CONCURRENCY,
+                         max_retries: int = LLM_MAX_RETRIES) -> tuple:
+    """
+    Assesses samples concurrently, keeping within the rate limits the API reports.
+
+    Requests go through llm_client.async_chat, so the evaluation shares its rate limit budget
+    and retry policy with every other call made through llm_client (and other processes with
+    RATE_LIMIT_BACKEND=sqlite).
+
+    Args:
+        model_name (str): Model to assess with.
+        samples (dict): line_id -> sample content.
+        concurrency (int): Maximum number of requests in flight.
+        max_retries (int): Retries per sample on rate limits, server errors and connection errors.
+
+    Returns:
+        tuple: (items, totals). items is a list in input order of dicts with line_id, answer
+            (None if it failed), latency_s, attempts and error. totals has counts, wall time,
+            latency stats and token usage.
+    """
+    from openai import APIConnectionError, APIStatusError
+
+    client = create_async_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    totals = {"items": len(samples), "failed": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    async def evaluate_one(line_id, content):
+        item = {"line_id": line_id, "answer": None, "latency_s": 0.0, "attempts": 0, "error": None}
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                completion = await async_chat(client, assessment_messages(content), model=model_name,
+                                              max_retries=max_retries, stats=item, max_tokens=MAX_TOKENS)
+            except (APIConnectionError, APIStatusError) as e:
+                item["error"] = str(e)
+            else:
+                item["answer"] = completion.choices[0].message.content.strip()
+                if completion.usage is not None:
+                    totals["prompt_tokens"] += completion.usage.prompt_tokens
+                    totals["completion_tokens"] += completion.usage.completion_tokens
+            item["latency_s"] = time.perf_counter() - start
+        return item
+
+    start = time.perf_counter()
+    try:
+        items = await asyncio.gather(*(evaluate_one(line_id, content) for line_id, content in samples.items()))
+    finally:
+        await client.close()
+
+    latencies = [item["latency_s"] for item in items]
+    totals["failed"] = sum(1 for item in items if item["answer"] is None)
+    totals["wall_s"] = time.perf_counter() - start
+    totals["mean_latency_s"] = sum(latencies) / len(latencies) if latencies else 0.0
+    totals["max_latency_s"] = max(latencies, default=0.0)
+    return items, totals
+
+
+def read_verify_file(file_path: str) -> dict:
+    samples = {}
+    with open(file_path, 'r') as verify_file:
+        for line in verify_file:
+            if line.strip():
+                line_id, content = line.strip().split('=')
+                samples[line_id] = content
+    return samples
+
+
+if __name__ == '__main__':
+    dataset_stats = build_training_dataset(
+        sources={
+            "data/lab_data/correct.txt": True,
+            "data/lab_data/incorrect.txt": False,
+        },
+        train_path="data/lab_data/training_dataset.jsonl",
+        validation_path="data/lab_data/validation_dataset.jsonl",
     )
+    print(f"Training dataset: {dataset_stats}")
 
     fine_tuned_model_name = "ft:gpt-4o-mini-2024-07-18:personal:s04e02:AbK0wMQY"
 
+    samples = read_verify_file("data/lab_data/verify.txt")
+
+    # --batch submits one batch job; --batch-local runs it against the local stand-in server,
+    # whose answers are made up and therefore never reported
+    batch_local = '--batch-local' in sys.argv
+    if '--batch' in sys.argv or batch_local:
+        local_server = None
+        backend = None
+        if batch_local:
+            local_server = LocalBatchServer(responder=lambda body: "true").start()
+            backend = local_server.backend()
+        try:
+            answers = assess_data_batch(fine_tuned_model_name, samples, backend=backend,
+                                        poll_interval=1 if local_server else 30)
+        finally:
+            if local_server:
+                local_server.stop()
+    else:
+        items, totals = asyncio.run(evaluate_async(fine_tuned_model_name, samples))
+        for item in items:
+            print(f"{item['line_id']}: {item['answer']} ({item['latency_s'] * 1000:.0f} ms, {item['attempts']} attempts)")
+        print(f"Evaluation totals: {totals}")
+        failed = [item for item in items if item["answer"] is None]
+        if failed:
+            for item in failed:
+                print(f"Failed {item['line_id']} after {item['attempts']} attempts: {item['error']}")
+            print(f"{len(failed)} of {len(items)} samples failed, not submitting an incomplete answer")
+            sys.exit(1)
+        answers = {item["line_id"]: item["answer"] for item in items}
+
     results = []
-    with open("data/lab_data/verify.txt", 'r') as verify_file:
-        for line in verify_file:
-            line_id, content = line.strip().split('=')
-            result = assess_data(fine_tuned_model_name, content)
-            if result.lower() == 'true':
-                print(line_id)
-                results.append(result)
+    for line_id, result in answers.items():
+        if result.lower() == 'true':
+            print(line_id)
+            results.append(result)
+
+    if batch_local:
+        print(f"Local batch run, not submitting {len(results)} stand-in answers")
+        sys.exit(0)
 
     final_payload = {
         "task": "research",
@@ -1,20 +1,18 @@
 import json
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
-import requests
+import http_client
 from bs4 import BeautifulSoup
 from markdownify import markdownify
 import re
 
+from llm_cache import get_cache
+from llm_client import build_messages, chat, prompt_cache_stats
 from utils import post_json_data_to_url
 
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 
@@ -22,31 +20,28 @@ AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 url = f"https://centrala.ag3nts.org/data/{AIDEVS_MY_APIKEY}/softo.json"
 
 # Get data from URL
-response = requests.get(url)
+response = http_client.get(url)
 questions = response.json()
 print(questions)
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
 
 def extract_markdown_from_page(url):
     """Extract markdown content from webpage"""
-    response = requests.get(url)
+    response = http_client.get(url)
     # Convert HTML to markdown
     markdown_content = markdownify(response.text, heading_style="ATX")
     return markdown_content.strip()
 
-def get_gpt_response(system_prompt: str, prompt: str) -> dict:
+def get_gpt_response(system_prompt: str, content: str, question: str) -> dict:
     """Get response from GPT model and parse it to JSON"""
-    response = openai_client.chat.completions.create(
+    # The page content is shared by every question asked about the page, so it precedes the question
+    response = chat(
         model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
-        ],
+        messages=build_messages(
+            system_prompt,
+            context=f"<website_content>\n{content}\n</website_content>",
+            query=f"<question>\n{question}\n</question>",
+        ),
         temperature=0
     )
         
@@ -91,16 +86,7 @@ def analyze_with_gpt_for_answer(content, question):
     </output_format>
     """
 
-    prompt = f"""
-    <question>
-    {question}
-    </question>
-    <website_content>
-    {content}
-    </website_content>
-    """
-
-    gpt_response_json = get_gpt_response(system_prompt, prompt)
+    gpt_response_json = get_gpt_response(system_prompt, content, question)
     return gpt_response_json["answer"]
 
 def analyze_with_gpt_for_next_step(content, question):
@@ -137,16 +123,7 @@ def analyze_with_gpt_for_next_step(content, question):
     </output_format>
     """
     
-    prompt = f"""
-    <question>
-    {question}
-    </question>
-    <website_content>
-    {content}
-    </website_content>
-    """
-
-    gpt_response_json = get_gpt_response(system_prompt, prompt)
+    gpt_response_json = get_gpt_response(system_prompt, content, question)
     return gpt_response_json["next_step"]
 
 def find_answer_on_page(url, question, visited=None):
@@ -198,6 +175,8 @@ for question_number in questions.keys():
         print(f"No answer found for: {question}")
 
 print("\nAll answers:", answers)
+print("llm cache:", get_cache().stats())
+print("prompt cache:", prompt_cache_stats())
 
 final_payload = {
     "task": "softo",
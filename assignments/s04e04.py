@@ -1,7 +1,6 @@
 import json
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 import requests
 
 from utils import post_json_data_to_url
@@ -9,9 +8,6 @@ from utils import post_json_data_to_url
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 
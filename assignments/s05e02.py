@@ -1,31 +1,23 @@
 import json
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
-import requests
+import http_client
 
+from llm_client import chat
 from utils import post_json_data_to_url
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
 CENTRALA_BASE_URL = os.getenv("CENTRALA_BASE_URL")
 AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 
 questions_url = f"https://centrala.ag3nts.org/data/{AIDEVS_MY_APIKEY}/gps_question.json"
 
 # Get data from URL
-response = requests.get(questions_url)
+response = http_client.get(questions_url)
 question = response.json()['question']
 print(question)
 
-openai_client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
 
 def clean_name(name: str):
     name = name.upper()
@@ -55,7 +47,7 @@ def get_people_from_api(person_name: str):
     print("Getting places for:", person_name)
     person_name = clean_name(person_name)
     people_url = f"{CENTRALA_BASE_URL}/people"
-    people_response = requests.get(people_url, json={
+    people_response = http_client.get(people_url, json={
         "query": person_name,
         "apikey": AIDEVS_MY_APIKEY
     })
@@ -78,7 +70,7 @@ def get_places_from_api(place_name: str):
     print("Getting people for:", place_name)
     place_name = clean_name(place_name)
     places_url = f"{CENTRALA_BASE_URL}/places"
-    places_response = requests.get(places_url, json={
+    places_response = http_client.get(places_url, json={
         "query": place_name,
         "apikey": AIDEVS_MY_APIKEY
     })
@@ -101,7 +93,7 @@ def get_persons_location_from_gps_api(user_id: int):
     print("Getting GPS for user_id:", user_id)
     gps_url = f"{CENTRALA_BASE_URL}/gps"
     headers = {'Content-Type': 'application/json'}
-    gps_response = requests.get(
+    gps_response = http_client.get(
         gps_url,
         json={
             "userID": user_id
@@ -127,7 +119,7 @@ def get_persons_user_id(person_name: str):
 
     sql_query_text = f"SELECT id FROM users WHERE username = '{person_name}'"
     users_url = f"{CENTRALA_BASE_URL}/apidb"
-    users_response = requests.get(users_url, json={
+    users_response = http_client.get(users_url, json={
         "task": "database",
         "apikey": AIDEVS_MY_APIKEY,
         "query": sql_query_text
@@ -242,7 +234,7 @@ def answer_question(question: str):
         {"role": "user", "content": question}
     ]
     
-    response = openai_client.chat.completions.create(
+    response = chat(
         model="gpt-4o",
         messages=messages,
         tools=tools,
@@ -274,7 +266,7 @@ def answer_question(question: str):
                 "content": str(function_response)
             })
         
-        response = openai_client.chat.completions.create(
+        response = chat(
             model="gpt-4o",
             messages=messages,
             tools=tools,
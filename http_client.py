@@ -0,0 +1,315 @@
+import asyncio
+import os
+import random
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection settings, overridable from the .env file
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+HTTP_ASYNC_CONCURRENCY = int(os.getenv("HTTP_ASYNC_CONCURRENCY", "20"))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Methods that are safe to send twice; other methods are only retried when the server cannot
+# have acted on the request (429, or a connection that was never established)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+_session = None
+_session_lock = threading.Lock()
+
+# The async client and semaphore are bound to the event loop they were created on
+_async_client = None
+_async_semaphore = None
+_async_loop = None
+_async_closer = None
+
+
+def create_session(pool_connections: int = HTTP_POOL_CONNECTIONS, pool_maxsize: int = HTTP_POOL_MAXSIZE):
+    """
+    Creates a requests.Session with keep-alive connection pooling.
+
+    Args:
+        pool_connections (int): Number of per-host pools to keep.
+        pool_maxsize (int): Maximum number of kept-alive connections per host.
+
+    Returns:
+        requests.Session: A session with pooled adapters mounted for http and https.
+    """
+    session = requests.Session()
+    # Retries are handled in request() so that we can add jitter and honour Retry-After
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """Returns the shared module-level session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def configure(pool_connections: int = None, pool_maxsize: int = None):
+    """Replaces the shared session with one using the given pool limits."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = create_session(
+            pool_connections=pool_connections or HTTP_POOL_CONNECTIONS,
+            pool_maxsize=pool_maxsize or HTTP_POOL_MAXSIZE,
+        )
+    return _session
+
+
+def backoff_delay(attempt: int, retry_after: str = None) -> float:
+    """
+    Computes the delay before the next retry using exponential backoff with full jitter.
+
+    Args:
+        attempt (int): Zero-based number of the retry.
+        retry_after (str, optional): Value of the Retry-After header, in seconds.
+
+    Returns:
+        float: Number of seconds to sleep.
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+def should_retry_status(method: str, status_code: int, retry_unsafe: bool = False) -> bool:
+    """Whether a response status is worth retrying for the given method."""
+    if status_code == 429:
+        return True
+    return status_code in RETRY_STATUS_CODES and (retry_unsafe or method.upper() in IDEMPOTENT_METHODS)
+
+
+def connect_failed(error: requests.RequestException) -> bool:
+    """Whether a requests error happened while connecting, i.e. before anything reached the server."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+def request(method: str, url: str, timeout=None, max_retries: int = HTTP_MAX_RETRIES,
+            retry_unsafe: bool = False, **kwargs):
+    """
+    Sends a request through the shared session, retrying on 429/5xx and connection errors.
+
+    429 responses and failed connection attempts (refused, unresolvable or timed out while
+    connecting) are retried for every method. 5xx responses, read timeouts and dropped
+    connections are only retried for idempotent methods, since a POST (such as a /report
+    submission) may already have been processed.
+
+    Args:
+        method (str): HTTP method, e.g. 'GET' or 'POST'.
+        url (str): Target URL.
+        timeout (float | tuple, optional): Requests timeout; defaults to (connect, read) from the env.
+        max_retries (int): Number of retries after the first attempt.
+        retry_unsafe (bool): Also retry 5xx and timeouts for non-idempotent methods.
+        **kwargs: Passed through to requests.Session.request (json, params, data, headers...).
+
+    Returns:
+        requests.Response: The last response received.
+
+    Raises:
+        requests.RequestException: If the request still fails with a connection error after all retries.
+    """
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    session = get_session()
+    idempotent = retry_unsafe or method.upper() in IDEMPOTENT_METHODS
+
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries or not (idempotent or connect_failed(e)):
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        if not should_retry_status(method, response.status_code, retry_unsafe) or attempt == max_retries:
+            return response
+
+        delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+        print(f"{method} {urlsplit(url).path} returned {response.status_code}, retrying in {delay:.2f}s")
+        response.close()
+        time.sleep(delay)
+
+
+def get(url: str, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+async def _close_when_loop_ends(client):
+    # asyncio.run() cancels leftover tasks before closing its loop, so the client is closed
+    # together with the loop even if close_async_client() was never called
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await client.aclose()
+
+
+def get_async_client():
+    """
+    Returns the shared httpx.AsyncClient for the running event loop, creating it on first use.
+
+    A client left over from another event loop is closed before it is replaced.
+    """
+    global _async_client, _async_semaphore, _async_loop, _async_closer
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_loop is not loop:
+        if _async_closer is not None and not _async_loop.is_closed():
+            _async_loop.call_soon_threadsafe(_async_closer.cancel)
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_ASYNC_CONCURRENCY,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE,
+            ),
+        )
+        _async_semaphore = asyncio.Semaphore(HTTP_ASYNC_CONCURRENCY)
+        _async_loop = loop
+        _async_closer = loop.create_task(_close_when_loop_ends(_async_client))
+    return _async_client
+
+
+async def close_async_client():
+    """Closes the shared async client; call it before the event loop finishes."""
+    global _async_client, _async_loop, _async_closer
+    if _async_closer is not None:
+        _async_closer.cancel()
+        try:
+            await _async_closer
+        except asyncio.CancelledError:
+            pass
+    elif _async_client is not None:
+        await _async_client.aclose()
+    _async_client = None
+    _async_loop = None
+    _async_closer = None
+
+
+async def async_request(method: str, url: str, max_retries: int = HTTP_MAX_RETRIES,
+                        retry_unsafe: bool = False, **kwargs):
+    """
+    Async twin of request(), with the same retry policy. At most HTTP_ASYNC_CONCURRENCY
+    requests are in flight at once.
+
+    Args:
+        method (str): HTTP method, e.g. 'GET' or 'POST'.
+        url (str): Target URL.
+        max_retries (int): Number of retries after the first attempt.
+        retry_unsafe (bool): Also retry 5xx and timeouts for non-idempotent methods.
+        **kwargs: Passed through to httpx.AsyncClient.request (json, params, data, headers, timeout...).
+
+    Returns:
+        httpx.Response: The last response received.
+
+    Raises:
+        httpx.TransportError: If the request still fails with a connection error after all retries.
+    """
+    client = get_async_client()
+    idempotent = retry_unsafe or method.upper() in IDEMPOTENT_METHODS
+
+    for attempt in range(max_retries + 1):
+        try:
+            async with _async_semaphore:
+                response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            if attempt == max_retries or not (idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))):
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+
+        if not should_retry_status(method, response.status_code, retry_unsafe) or attempt == max_retries:
+            return response
+
+        delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+        print(f"{method} {urlsplit(url).path} returned {response.status_code}, retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+
+async def async_get(url: str, **kwargs):
+    return await async_request("GET", url, **kwargs)
+
+
+async def async_post(url: str, **kwargs):
+    return await async_request("POST", url, **kwargs)
+
+
+def benchmark_round_trips(url: str, n: int = 20):
+    """
+    Compares the latency of n GET requests made with fresh connections against the pooled session.
+
+    Each variant gets one unmeasured warm-up request (DNS, imports, the pool's first
+    connection), and medians are reported so a single slow round trip does not skew the result.
+
+    Args:
+        url (str): URL to request.
+        n (int): Number of round trips per variant.
+
+    Returns:
+        dict: Median latency in seconds for both variants and the median time saved per round trip.
+    """
+    fresh_times = []
+    requests.get(url, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    for _ in range(n):
+        start = time.perf_counter()
+        requests.get(url, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        fresh_times.append(time.perf_counter() - start)
+
+    pooled_times = []
+    get(url)  # warm up the pool so every measured call reuses the connection
+    for _ in range(n):
+        start = time.perf_counter()
+        get(url)
+        pooled_times.append(time.perf_counter() - start)
+
+    fresh_median = statistics.median(fresh_times)
+    pooled_median = statistics.median(pooled_times)
+    return {
+        "fresh_connection_s": fresh_median,
+        "pooled_connection_s": pooled_median,
+        "saved_per_round_trip_s": fresh_median - pooled_median,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark_url = sys.argv[1] if len(sys.argv) > 1 else f"{os.getenv('CENTRALA_BASE_URL')}/"
+    results = benchmark_round_trips(benchmark_url)
+    print(f"fresh connection (median):  {results['fresh_connection_s'] * 1000:.1f} ms")
+    print(f"pooled connection (median): {results['pooled_connection_s'] * 1000:.1f} ms")
+    print(f"saved per round trip (median): {results['saved_per_round_trip_s'] * 1000:.1f} ms")
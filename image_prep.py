@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import io
+import json
+import math
+import os
+import tempfile
+from collections import namedtuple
+
+from PIL import Image
+from dotenv import load_dotenv
+
+import http_client
+
+load_dotenv()
+
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1024"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG")
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "cache/images")
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+PreparedImage = namedtuple(
+    "PreparedImage",
+    ["data", "mime_type", "original_bytes", "prepared_bytes", "original_tokens", "prepared_tokens"],
+)
+
+
+def estimate_vision_tokens(width: int, height: int) -> int:
+    """
+    Estimates the prompt tokens of an image sent with detail='high' (gpt-4o tile pricing).
+
+    The image is fitted into 2048x2048, its shortest side is scaled down to 768 and each
+    512px tile costs 170 tokens on top of a base of 85.
+    """
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def to_base64(prepared: PreparedImage) -> str:
+    return base64.b64encode(prepared.data).decode("utf-8")
+
+
+def to_data_url(prepared: PreparedImage) -> str:
+    return f"data:{prepared.mime_type};base64,{to_base64(prepared)}"
+
+
+def describe_savings(prepared: PreparedImage) -> str:
+    return (
+        f"{prepared.original_bytes} -> {prepared.prepared_bytes} bytes, "
+        f"~{prepared.original_tokens} -> {prepared.prepared_tokens} tokens "
+        f"(saved {prepared.original_bytes - prepared.prepared_bytes} bytes, "
+        f"~{prepared.original_tokens - prepared.prepared_tokens} tokens)"
+    )
+
+
+def prepare_image(source, max_side: int = IMAGE_MAX_SIDE, image_format: str = IMAGE_FORMAT,
+                  quality: int = IMAGE_QUALITY) -> PreparedImage:
+    """
+    Downscales and re-encodes an image before it is sent to a vision model.
+
+    The image is decoded once, its longest side capped at max_side and it is re-encoded in
+    image_format at the given quality. Results are cached on disk by the hash of the source
+    bytes and the settings. If re-encoding would not make the image smaller, the original
+    bytes are kept.
+
+    Args:
+        source (str | bytes): Path to an image file or the raw image bytes.
+        max_side (int): Maximum length in pixels of the longest side.
+        image_format (str): 'JPEG' or 'WEBP'.
+        quality (int): Encoder quality, 1-100.
+
+    Returns:
+        PreparedImage: Encoded bytes, their mime type and the size and token estimates
+            before and after preparation.
+    """
+    image_format = image_format.upper()
+    if image_format not in ("JPEG", "WEBP"):
+        raise ValueError("image_format must be JPEG or WEBP.")
+
+    if isinstance(source, bytes):
+        original = source
+    else:
+        with open(source, "rb") as f:
+            original = f.read()
+
+    key = hashlib.sha256(original + f"|{max_side}|{image_format}|{quality}".encode()).hexdigest()
+    data_path = os.path.join(IMAGE_CACHE_DIR, f"{key}.bin")
+    meta_path = os.path.join(IMAGE_CACHE_DIR, f"{key}.json")
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        with open(data_path, "rb") as f:
+            return PreparedImage(data=f.read(), **meta)
+
+    image = Image.open(io.BytesIO(original))
+    image.load()
+    original_tokens = estimate_vision_tokens(*image.size)
+    original_mime = MIME_TYPES.get(image.format, "image/jpeg")
+
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    # JPEG has no alpha channel, so transparent areas are flattened onto white
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image_format == "WEBP" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=True)
+    data, mime_type = buffer.getvalue(), MIME_TYPES[image_format]
+    prepared_tokens = estimate_vision_tokens(*image.size)
+
+    if len(data) >= len(original) and prepared_tokens >= original_tokens:
+        data, mime_type, prepared_tokens = original, original_mime, original_tokens
+
+    meta = {
+        "mime_type": mime_type,
+        "original_bytes": len(original),
+        "prepared_bytes": len(data),
+        "original_tokens": original_tokens,
+        "prepared_tokens": prepared_tokens,
+    }
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    _atomic_write(data_path, data)
+    _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+    return PreparedImage(data=data, **meta)
+
+
+def _atomic_write(path: str, data: bytes):
+    # Several threads may prepare the same image at once, so each writes its own temp file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def prepare_image_url(url: str, **kwargs) -> PreparedImage:
+    """Downloads an image through the shared HTTP session and prepares it with prepare_image."""
+    response = http_client.get(url)
+    response.raise_for_status()
+    return prepare_image(response.content, **kwargs)
@@ -0,0 +1,312 @@
+import email.parser
+import email.policy
+import http.server
+import json
+import os
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BATCH_DIR = os.getenv("BATCH_DIR", "cache/batches")
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", str(24 * 3600)))
+
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def write_batch_file(path: str, requests: dict, endpoint: str = CHAT_COMPLETIONS_ENDPOINT) -> str:
+    """
+    Writes requests as a batch input file, one JSON request per line.
+
+    Args:
+        path (str): Output path of the .jsonl file.
+        requests (dict): custom_id -> request body (model, messages, ...).
+        endpoint (str): API endpoint every request is sent to.
+
+    Returns:
+        str: The path written.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for custom_id, body in requests.items():
+            line = {"custom_id": str(custom_id), "method": "POST", "url": endpoint, "body": body}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+    return path
+
+
+def parse_batch_output(text: str):
+    """
+    Parses a batch output file.
+
+    Returns:
+        tuple: (results, errors) where results maps custom_id -> response body and errors
+            maps custom_id -> error description for the requests that failed.
+    """
+    results, errors = {}, {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if item.get("error") or response.get("status_code") != 200:
+            errors[item["custom_id"]] = item.get("error") or response.get("body")
+        else:
+            results[item["custom_id"]] = response["body"]
+    return results, errors
+
+
+class OpenAIBatchBackend:
+    """
+    Batch backend on top of the OpenAI Files and Batches API.
+
+    Any client exposing the same API works, e.g. one pointed at LocalBatchServer.
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            from llm_client import get_client
+
+            client = get_client()
+        self.client = client
+
+    def submit(self, path: str, endpoint: str = CHAT_COMPLETIONS_ENDPOINT) -> str:
+        """Uploads a batch input file and starts the batch. Returns the batch id."""
+        with open(path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=endpoint,
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> dict:
+        """Returns the batch status and, once available, its output and error file ids."""
+        batch = self.client.batches.retrieve(batch_id)
+        return {
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id,
+        }
+
+    def download(self, file_id: str) -> str:
+        return self.client.files.content(file_id).text
+
+
+def run_batch(requests: dict, backend=None, name: str = None, endpoint: str = CHAT_COMPLETIONS_ENDPOINT,
+              poll_interval: float = BATCH_POLL_INTERVAL, timeout: float = BATCH_TIMEOUT):
+    """
+    Runs requests as one batch job: writes the input file, submits it, polls until the job
+    finishes and maps the results back to their custom ids.
+
+    Args:
+        requests (dict): custom_id -> request body.
+        backend: Batch backend; defaults to OpenAIBatchBackend with the shared client.
+        name (str, optional): Name of the input file under BATCH_DIR.
+        endpoint (str): API endpoint every request is sent to.
+        poll_interval (float): Seconds between status checks.
+        timeout (float): Seconds to wait before giving up.
+
+    Returns:
+        tuple: (results, errors) as returned by parse_batch_output.
+
+    Raises:
+        RuntimeError: If the batch does not complete.
+        TimeoutError: If the batch is still running after timeout seconds.
+    """
+    backend = backend or OpenAIBatchBackend()
+    path = write_batch_file(os.path.join(BATCH_DIR, f"{name or uuid.uuid4().hex}.jsonl"), requests, endpoint)
+    batch_id = backend.submit(path, endpoint)
+    print(f"Submitted batch {batch_id} with {len(requests)} requests")
+
+    deadline = time.monotonic() + timeout
+    while True:
+        status = backend.status(batch_id)
+        if status["status"] in TERMINAL_STATUSES:
+            break
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Batch {batch_id} still {status['status']} after {timeout}s")
+        time.sleep(poll_interval)
+
+    if status["status"] != "completed":
+        raise RuntimeError(f"Batch {batch_id} finished with status {status['status']}")
+
+    results, errors = {}, {}
+    if status["output_file_id"]:
+        results, errors = parse_batch_output(backend.download(status["output_file_id"]))
+    if status["error_file_id"]:
+        errors.update(parse_batch_output(backend.download(status["error_file_id"]))[1])
+    print(f"Batch {batch_id} completed: {len(results)} succeeded, {len(errors)} failed")
+    return results, errors
+
+
+def echo_responder(body: dict) -> str:
+    """Default LocalBatchServer responder: answers with the last message of the request."""
+    return str(body["messages"][-1]["content"])
+
+
+class LocalBatchServer:
+    """
+    Local stand-in for the Files and Batches API, for running batch mode without the network.
+
+    Each chat request in a submitted batch is answered by responder(body) -> str. Batches
+    complete on a background thread after `delay` seconds. As with the real API, requests
+    whose responder raises are written to a separate error file.
+    """
+
+    def __init__(self, responder=echo_responder, delay: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.responder = responder
+        self.delay = delay
+        self.files = {}
+        self.batches = {}
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer((host, port), self._make_handler())
+        self.base_url = f"http://{host}:{self._server.server_port}/v1"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def backend(self) -> OpenAIBatchBackend:
+        """Returns an OpenAIBatchBackend whose client talks to this server."""
+        import httpx
+        from openai import OpenAI
+
+        client = OpenAI(base_url=self.base_url, api_key="local", max_retries=0, http_client=httpx.Client())
+        return OpenAIBatchBackend(client)
+
+    def _add_file(self, content: bytes, filename: str, purpose: str) -> dict:
+        file = {
+            "id": f"file-{uuid.uuid4().hex}",
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self._lock:
+            self.files[file["id"]] = (file, content)
+        return file
+
+    def _run(self, batch_id: str):
+        time.sleep(self.delay)
+        with self._lock:
+            batch = self.batches[batch_id]
+            batch["status"] = "in_progress"
+            content = self.files[batch["input_file_id"]][1]
+        output, failed = [], []
+        for line in content.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            body = request["body"]
+            try:
+                answer = self.responder(body)
+                response = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": answer}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }}
+                lines = output
+            except Exception as e:
+                # Failed requests go to the error file, as the real API does
+                response = {"status_code": 500, "request_id": uuid.uuid4().hex,
+                            "body": {"error": {"message": str(e), "type": "server_error"}}}
+                lines = failed
+            lines.append(json.dumps({"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"],
+                                     "response": response, "error": None}))
+        file_ids = {}
+        for field, lines, suffix in (("output_file_id", output, "output"), ("error_file_id", failed, "error")):
+            if lines:
+                content = ("\n".join(lines) + "\n").encode("utf-8")
+                file_ids[field] = self._add_file(content, f"{batch_id}_{suffix}.jsonl", "batch_output")["id"]
+        with self._lock:
+            batch.update(file_ids)
+            batch["status"] = "completed"
+            batch["completed_at"] = int(time.time())
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, payload, content_type: str = "application/json"):
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _not_found(self):
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path == "/v1/files":
+                    message = email.parser.BytesParser(policy=email.policy.default).parsebytes(
+                        f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + body
+                    )
+                    fields = {}
+                    for part in message.iter_parts():
+                        fields[part.get_param("name", header="content-disposition")] = part
+                    file_part = fields["file"]
+                    purpose = fields["purpose"].get_payload(decode=True).decode("utf-8")
+                    self._send(200, server._add_file(file_part.get_payload(decode=True),
+                                                     file_part.get_filename(), purpose))
+                elif self.path == "/v1/batches":
+                    request = json.loads(body)
+                    batch = {
+                        "id": f"batch_{uuid.uuid4().hex}",
+                        "object": "batch",
+                        "endpoint": request["endpoint"],
+                        "input_file_id": request["input_file_id"],
+                        "completion_window": request["completion_window"],
+                        "status": "validating",
+                        "output_file_id": None,
+                        "error_file_id": None,
+                        "created_at": int(time.time()),
+                    }
+                    with server._lock:
+                        server.batches[batch["id"]] = batch
+                    threading.Thread(target=server._run, args=(batch["id"],), daemon=True).start()
+                    self._send(200, batch)
+                else:
+                    self._not_found()
+
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                with server._lock:
+                    if parts[:2] == ["v1", "batches"] and len(parts) == 3 and parts[2] in server.batches:
+                        payload, content_type = dict(server.batches[parts[2]]), "application/json"
+                    elif parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[2] in server.files:
+                        payload, content_type = server.files[parts[2]][1], "application/octet-stream"
+                    else:
+                        payload = None
+                if payload is None:
+                    self._not_found()
+                else:
+                    self._send(200, payload, content_type)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
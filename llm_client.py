@@ -0,0 +1,567 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Optional, Union
+
+import httpx
+from dotenv import load_dotenv
+
+from http_client import backoff_delay
+from llm_cache import LLM_CACHE_BYPASS, get_cache, make_key
+from rate_limiter import get_rate_limiter
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+if TYPE_CHECKING:
+    import numpy as np
+    from openai import AsyncOpenAI, OpenAI
+    from openai.types.chat import ChatCompletion, ChatCompletionMessageParam
+
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
+OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
+
+# Transport settings shared by every OpenAI call in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "600"))
+# Retries of a request on rate limits, server errors and connection errors, done by
+# _limited_request so every attempt waits on the rate limiter
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Statuses the OpenAI SDK itself treats as transient
+LLM_RETRY_STATUS_CODES = {408, 409, 429}
+
+DEFAULT_CHAT_MODEL = "gpt-4o-mini"
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-large"
+DEFAULT_TRANSCRIPTION_MODEL = "whisper-1"
+
+# Per-request limits for embedding batches (the API allows 2048 inputs and 300k tokens)
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "2048"))
+EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "250000"))
+# Longest single input the embedding models accept
+EMBED_MAX_INPUT_TOKENS = int(os.getenv("EMBED_MAX_INPUT_TOKENS", "8192"))
+
+# Tokens charged for an image part of a chat message (a 1024px image at detail='high')
+IMAGE_PART_TOKENS = 765
+
+# A file object, or a (filename, bytes or file object) tuple as accepted by the SDK
+AudioFile = Union[BinaryIO, tuple]
+
+_client = None
+_client_lock = threading.Lock()
+
+_encodings = {}
+
+# Per-thread stack of usage totals opened with track_usage()
+_usage_local = threading.local()
+
+# Process-wide provider-side prompt cache counters, see prompt_cache_stats()
+_prompt_cache = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "hit_calls": 0,
+                 "hit_latency_s": 0.0, "miss_latency_s": 0.0}
+_prompt_cache_lock = threading.Lock()
+
+
+def get_client() -> "OpenAI":
+    """
+    Returns the shared OpenAI client, importing the SDK and building the client on first use.
+
+    All callers share one pooled httpx transport, so connections to the API are kept alive
+    across scripts, helpers and threads. The SDK's own retries are off: _limited_request
+    retries instead, going through the rate limiter on every attempt.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+
+                transport = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                    ),
+                    timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                )
+                _client = OpenAI(
+                    organization=OPENAI_ORGANIZATION_ID,
+                    project=OPENAI_PROJECT_ID,
+                    api_key=OPENAI_API_KEY,
+                    max_retries=0,
+                    http_client=transport,
+                )
+    return _client
+
+
+def create_async_client(max_retries: int = 0) -> "AsyncOpenAI":
+    """
+    Creates an AsyncOpenAI client with a pooled transport.
+
+    Async clients are bound to the event loop they are used on, so callers create one per
+    run and close it with `await client.close()`. Retries are off by default so callers can
+    apply their own backoff and rate limiting.
+    """
+    from openai import AsyncOpenAI
+
+    transport = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        ),
+        timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    )
+    return AsyncOpenAI(
+        organization=OPENAI_ORGANIZATION_ID,
+        project=OPENAI_PROJECT_ID,
+        api_key=OPENAI_API_KEY,
+        max_retries=max_retries,
+        http_client=transport,
+    )
+
+
+@contextmanager
+def track_usage():
+    """
+    Collects the token usage of every chat() call made by the current thread inside the block.
+
+    Yields:
+        dict: Running totals of calls, prompt_tokens, cached_tokens, completion_tokens and
+            total_tokens.
+    """
+    totals = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    stack = getattr(_usage_local, "stack", None)
+    if stack is None:
+        stack = _usage_local.stack = []
+    stack.append(totals)
+    try:
+        yield totals
+    finally:
+        stack.remove(totals)
+
+
+def record_usage(response):
+    """Adds a completion's usage to every open track_usage() block of the current thread."""
+    usage = getattr(response, "usage", None)
+    for totals in getattr(_usage_local, "stack", ()):
+        totals["calls"] += 1
+        if usage is not None:
+            totals["prompt_tokens"] += usage.prompt_tokens
+            totals["cached_tokens"] += cached_prompt_tokens(usage)
+            totals["completion_tokens"] += usage.completion_tokens
+            totals["total_tokens"] += usage.total_tokens
+
+
+def cached_prompt_tokens(usage) -> int:
+    """Returns usage.prompt_tokens_details.cached_tokens, or 0 when the API did not report it."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def record_prompt_cache(response, latency_s: float):
+    """Adds a completion's prompt and cached-prefix tokens and its latency to the process-wide counters."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    cached_tokens = cached_prompt_tokens(usage)
+    with _prompt_cache_lock:
+        _prompt_cache["calls"] += 1
+        _prompt_cache["prompt_tokens"] += usage.prompt_tokens
+        _prompt_cache["cached_tokens"] += cached_tokens
+        if cached_tokens:
+            _prompt_cache["hit_calls"] += 1
+            _prompt_cache["hit_latency_s"] += latency_s
+        else:
+            _prompt_cache["miss_latency_s"] += latency_s
+
+
+def prompt_cache_stats() -> dict:
+    """
+    Summarizes provider-side prompt caching for the chat calls made by this process.
+
+    Returns:
+        dict: calls, prompt_tokens, cached_tokens, the share of prompt tokens served from the
+            cache and the mean latency of calls with and without a cached prefix.
+    """
+    with _prompt_cache_lock:
+        stats = dict(_prompt_cache)
+    miss_calls = stats["calls"] - stats["hit_calls"]
+    return {
+        "calls": stats["calls"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "cached_tokens": stats["cached_tokens"],
+        "cached_share": stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0,
+        "hit_calls": stats["hit_calls"],
+        "mean_hit_latency_s": stats["hit_latency_s"] / stats["hit_calls"] if stats["hit_calls"] else None,
+        "mean_miss_latency_s": stats["miss_latency_s"] / miss_calls if miss_calls else None,
+    }
+
+
+def build_messages(instructions: str, context: Optional[str] = None,
+                   query: Optional[str] = None) -> list:
+    """
+    Builds chat messages ordered from most to least stable, so repeated calls share a prefix.
+
+    The provider caches prompt prefixes (from about 1024 tokens), so content that is the same
+    across calls has to come first and anything that changes per call last.
+
+    Args:
+        instructions (str): Fixed instructions, sent as the system message.
+        context (str, optional): Large content shared by several calls (a document, a page,
+            reference rules), sent as the first user message.
+        query (str, optional): The per-call part (question, input), sent last.
+
+    Returns:
+        list: Chat messages.
+    """
+    messages = [{"role": "system", "content": instructions}]
+    if context:
+        messages.append({"role": "user", "content": context})
+    if query:
+        messages.append({"role": "user", "content": query})
+    return messages
+
+
+def _rewind_files(kwargs: dict):
+    """Seeks file arguments (file objects or (filename, file) tuples) back to the start before a retry."""
+    for value in kwargs.values():
+        file = value[1] if isinstance(value, tuple) and len(value) > 1 else value
+        if hasattr(file, "seek"):
+            file.seek(0)
+
+
+def _retry_delay(error: Exception, attempt: int, max_retries: int) -> Optional[float]:
+    """Returns the backoff before retrying a failed API call, or None if it must not be retried."""
+    from openai import APIConnectionError, APIStatusError
+
+    if attempt >= max_retries:
+        return None
+    if isinstance(error, APIStatusError):
+        if error.status_code not in LLM_RETRY_STATUS_CODES and error.status_code < 500:
+            return None
+        return backoff_delay(attempt, error.response.headers.get("retry-after"))
+    if isinstance(error, APIConnectionError):
+        return backoff_delay(attempt)
+    return None
+
+
+def _limited_request(resource, method: str, model: str, tokens: int = 0, max_retries: int = LLM_MAX_RETRIES,
+                     **kwargs):
+    """
+    Calls resource.<method>(model=model, **kwargs) within the model's shared rate limits.
+
+    Every attempt waits on the process-wide limiter, and the x-ratelimit-* headers of the
+    response, or of the error response, are fed back into it. Rate limits, server errors and
+    connection errors are retried up to max_retries times with backoff_delay, honouring
+    Retry-After.
+    """
+    from openai import APIConnectionError, APIStatusError
+
+    limiter = get_rate_limiter()
+    for attempt in range(max_retries + 1):
+        limiter.acquire(model, tokens)
+        try:
+            raw = getattr(resource.with_raw_response, method)(model=model, **kwargs)
+        except (APIConnectionError, APIStatusError) as e:
+            if isinstance(e, APIStatusError):
+                limiter.update(model, e.response.headers)
+            delay = _retry_delay(e, attempt, max_retries)
+            if delay is None:
+                raise
+        else:
+            limiter.update(model, raw.headers)
+            return raw.parse()
+        time.sleep(delay)
+        _rewind_files(kwargs)
+
+
+async def _async_limited_request(resource, method: str, model: str, tokens: int = 0,
+                                 max_retries: int = LLM_MAX_RETRIES, stats: Optional[dict] = None, **kwargs):
+    """
+    Async twin of _limited_request() for resources of an AsyncOpenAI client.
+
+    If stats is given, stats['attempts'] is incremented for every request sent.
+    """
+    from openai import APIConnectionError, APIStatusError
+
+    limiter = get_rate_limiter()
+    for attempt in range(max_retries + 1):
+        await limiter.async_acquire(model, tokens)
+        if stats is not None:
+            stats["attempts"] = stats.get("attempts", 0) + 1
+        try:
+            raw = await getattr(resource.with_raw_response, method)(model=model, **kwargs)
+        except (APIConnectionError, APIStatusError) as e:
+            if isinstance(e, APIStatusError):
+                await limiter.async_update(model, e.response.headers)
+            delay = _retry_delay(e, attempt, max_retries)
+            if delay is None:
+                raise
+        else:
+            await limiter.async_update(model, raw.headers)
+            return raw.parse()
+        await asyncio.sleep(delay)
+        _rewind_files(kwargs)
+
+
+def _chat_request(model: str, messages: list, **kwargs):
+    max_tokens = kwargs.get("max_tokens") or kwargs.get("max_completion_tokens")
+    tokens = estimate_request_tokens(messages=messages, max_tokens=max_tokens)
+    start = time.perf_counter()
+    response = _limited_request(get_client().chat.completions, "create", model, tokens, messages=messages, **kwargs)
+    if not kwargs.get("stream"):
+        record_prompt_cache(response, time.perf_counter() - start)
+    return response
+
+
+def chat(messages: Iterable["ChatCompletionMessageParam"], model: str = DEFAULT_CHAT_MODEL,
+         cache: Optional[bool] = None, **kwargs) -> "ChatCompletion":
+    """
+    Creates a chat completion, serving repeated deterministic requests from the response cache.
+
+    Args:
+        messages (list): Chat messages.
+        model (str): Model name.
+        cache (bool, optional): Use the response cache. By default only requests with
+            temperature=0 are cached; LLM_CACHE_BYPASS=1 disables the cache entirely.
+        **kwargs: Passed through to chat.completions.create (temperature, tools, max_tokens...).
+
+    Returns:
+        ChatCompletion: The full completion, so callers can read tool calls and usage.
+    """
+    if cache is None:
+        cache = kwargs.get("temperature") == 0
+    messages = list(messages)
+    if not cache or LLM_CACHE_BYPASS or kwargs.get("stream"):
+        response = _chat_request(model, messages, **kwargs)
+        if not kwargs.get("stream"):
+            record_usage(response)
+        return response
+
+    from openai.types.chat import ChatCompletion
+
+    response_cache = get_cache()
+    key = make_key(model=model, messages=messages, **kwargs)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return ChatCompletion.model_validate_json(cached)
+
+    response = _chat_request(model, messages, **kwargs)
+    response_cache.set(key, response.model_dump_json())
+    record_usage(response)
+    return response
+
+
+async def async_chat(client: "AsyncOpenAI", messages: Iterable["ChatCompletionMessageParam"],
+                     model: str = DEFAULT_CHAT_MODEL, max_retries: int = LLM_MAX_RETRIES,
+                     stats: Optional[dict] = None, **kwargs) -> "ChatCompletion":
+    """
+    Async twin of chat() for a client from create_async_client(), without the response cache.
+
+    Requests share the rate limiter and retry policy of chat().
+
+    Args:
+        client (AsyncOpenAI): Client bound to the running event loop.
+        messages (list): Chat messages.
+        model (str): Model name.
+        max_retries (int): Retries on rate limits, server errors and connection errors.
+        stats (dict, optional): stats['attempts'] is incremented for every request sent.
+        **kwargs: Passed through to chat.completions.create (temperature, max_tokens...).
+
+    Returns:
+        ChatCompletion: The full completion.
+    """
+    messages = list(messages)
+    max_tokens = kwargs.get("max_tokens") or kwargs.get("max_completion_tokens")
+    tokens = estimate_request_tokens(messages=messages, max_tokens=max_tokens)
+    start = time.perf_counter()
+    response = await _async_limited_request(client.chat.completions, "create", model, tokens,
+                                            max_retries=max_retries, stats=stats, messages=messages, **kwargs)
+    record_prompt_cache(response, time.perf_counter() - start)
+    record_usage(response)
+    return response
+
+
+def chat_text(messages: Iterable["ChatCompletionMessageParam"], model: str = DEFAULT_CHAT_MODEL,
+              **kwargs) -> str:
+    """Creates a chat completion and returns the stripped content of the first choice."""
+    return chat(messages, model=model, **kwargs).choices[0].message.content.strip()
+
+
+def embed(texts: Union[str, list[str]], model: str = DEFAULT_EMBEDDING_MODEL,
+          dimensions: Optional[int] = None) -> list[list[float]]:
+    """
+    Creates embeddings for one or more texts.
+
+    Args:
+        texts (str | list[str]): Text or texts to embed.
+        model (str): Embedding model name.
+        dimensions (int, optional): Requested vector size.
+
+    Returns:
+        list[list[float]]: One vector per input text, in input order.
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+    kwargs = {"dimensions": dimensions} if dimensions else {}
+    tokens = estimate_request_tokens(texts=texts)
+    response = _limited_request(get_client().embeddings, "create", model, tokens, input=texts, **kwargs)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token), used for request budgeting."""
+    return len(text) // 4 + 1
+
+
+def count_tokens(text: str, model: str = DEFAULT_CHAT_MODEL) -> int:
+    """Counts tokens with tiktoken when it is installed, falling back to estimate_tokens."""
+    if tiktoken is None:
+        return estimate_tokens(text)
+    encoding = _encodings.get(model)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        _encodings[model] = encoding
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def estimate_request_tokens(messages: list = None, texts: list = None, max_tokens: int = None) -> int:
+    """
+    Estimates the tokens a request counts against the tokens-per-minute limit.
+
+    Args:
+        messages (list, optional): Chat messages; text parts are estimated from their length
+            and image parts are charged IMAGE_PART_TOKENS each.
+        texts (list, optional): Embedding inputs.
+        max_tokens (int, optional): Completion budget, which the API also counts.
+    """
+    tokens = max_tokens or 0
+    for text in texts or ():
+        tokens += estimate_tokens(text)
+    for message in messages or ():
+        if hasattr(message, "model_dump"):
+            message = message.model_dump(exclude_none=True)
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            tokens += estimate_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "image_url":
+                    tokens += IMAGE_PART_TOKENS
+                else:
+                    tokens += estimate_tokens(str(part.get("text", "")))
+        tokens += 4
+    return tokens
+
+
+def iter_batches(texts: list, max_batch_size: int, max_batch_tokens: int, model: str = DEFAULT_CHAT_MODEL,
+                 max_input_tokens: Optional[int] = None):
+    """
+    Yields lists of indices into texts, each within the item and token budgets.
+
+    Tokens are counted with count_tokens() for the given model.
+
+    Raises:
+        ValueError: If a single text is longer than max_input_tokens.
+    """
+    batch, batch_tokens = [], 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text, model)
+        if max_input_tokens is not None and tokens > max_input_tokens:
+            raise ValueError(f"Input {i} has {tokens} tokens, more than the {max_input_tokens} allowed for {model}")
+        if batch and (len(batch) >= max_batch_size or batch_tokens + tokens > max_batch_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def embed_batch(texts: list[str], model: str = DEFAULT_EMBEDDING_MODEL, dimensions: Optional[int] = None,
+                dtype: str = "float32", use_cache: bool = True,
+                max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+                max_batch_tokens: int = EMBED_MAX_BATCH_TOKENS,
+                max_input_tokens: int = EMBED_MAX_INPUT_TOKENS) -> "np.ndarray":
+    """
+    Embeds many texts, packing them into as few requests as the limits allow.
+
+    Vectors are cached on disk by text hash, model and dimensions, so only new or changed
+    texts are sent to the API.
+
+    Args:
+        texts (list[str]): Texts to embed.
+        model (str): Embedding model name.
+        dimensions (int, optional): Requested vector size.
+        dtype (str): Storage type of the on-disk cache, 'float32' or 'float16'.
+        use_cache (bool): Read and write the vector cache.
+        max_batch_size (int): Maximum number of texts per request.
+        max_batch_tokens (int): Maximum tokens per request.
+        max_input_tokens (int): Maximum tokens of a single text.
+
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), dimensions), in input order.
+
+    Raises:
+        ValueError: If a text is longer than max_input_tokens; nothing is sent in that case.
+    """
+    import numpy as np
+
+    from vector_cache import get_vector_cache, text_hash
+
+    keys = [text_hash(text) for text in texts]
+    cache = get_vector_cache(model, dimensions=dimensions, dtype=dtype) if use_cache else None
+    found = cache.get_many(keys) if cache is not None else {}
+
+    missing = []
+    seen = set()
+    for i, key in enumerate(keys):
+        if key not in found and key not in seen:
+            missing.append(i)
+            seen.add(key)
+    missing_texts = [texts[i] for i in missing]
+
+    # Plan every batch first so an oversized text fails before any request is made
+    batches = list(iter_batches(missing_texts, max_batch_size, max_batch_tokens, model, max_input_tokens))
+    for batch in batches:
+        batch_keys = [keys[missing[i]] for i in batch]
+        vectors = embed([missing_texts[i] for i in batch], model=model, dimensions=dimensions)
+        if cache is not None:
+            cache.add_many(batch_keys, vectors)
+        found.update(zip(batch_keys, (np.asarray(vector, dtype=np.float32) for vector in vectors)))
+
+    if not texts:
+        return np.empty((0, dimensions or 0), dtype=np.float32)
+    return np.stack([found[key] for key in keys])
+
+
+def transcribe(file: AudioFile, model: str = DEFAULT_TRANSCRIPTION_MODEL, **kwargs) -> str:
+    """
+    Transcribes an audio file.
+
+    Args:
+        file (file object | tuple): Open binary file, or (filename, bytes or file object).
+        model (str): Transcription model name.
+        **kwargs: Passed through to audio.transcriptions.create (language, prompt...).
+
+    Returns:
+        str: The transcription text.
+    """
+    transcription = _limited_request(get_client().audio.transcriptions, "create", model, file=file, **kwargs)
+    return transcription if isinstance(transcription, str) else transcription.text
+
+
+def generate_image(prompt: str, model: str = "dall-e-3", **kwargs) -> str:
+    """Generates an image and returns the URL of the first result."""
+    response = _limited_request(get_client().images, "generate", model, prompt=prompt, **kwargs)
+    return response.data[0].url
@@ -0,0 +1,257 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 'memory' coordinates the threads of one process, 'sqlite' every process sharing RATE_LIMIT_PATH,
+# 'off' disables limiting
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", "cache/rate_limits.sqlite")
+# Longest single sleep while waiting, so a waiter notices refills reported by other callers
+RATE_LIMIT_MAX_SLEEP = float(os.getenv("RATE_LIMIT_MAX_SLEEP", "1"))
+
+
+class MemoryBackend:
+    """Keeps bucket state in a dict shared by every thread of the process."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self, keys: list):
+        with self._lock:
+            yield self._buckets
+
+
+class SQLiteBackend:
+    """
+    Keeps bucket state in a SQLite file so that several processes share one budget.
+
+    Every read-modify-write runs in a BEGIN IMMEDIATE transaction, which SQLite serializes
+    across processes.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                level REAL NOT NULL,
+                capacity REAL NOT NULL,
+                rate REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    @contextmanager
+    def transaction(self, keys: list):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                placeholders = ",".join("?" * len(keys))
+                rows = self._conn.execute(
+                    f"SELECT key, level, capacity, rate, updated_at FROM buckets WHERE key IN ({placeholders})", keys
+                ).fetchall()
+                buckets = {row[0]: list(row[1:]) for row in rows}
+                yield buckets
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (key, level, capacity, rate, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    [(key, *bucket) for key, bucket in buckets.items() if key in keys],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+def _refill(bucket: list, now: float):
+    level, capacity, rate, updated_at = bucket
+    bucket[0] = min(capacity, level + rate * max(0.0, now - updated_at))
+    bucket[3] = now
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for the request and token budgets of each model.
+
+    Each model has a 'requests' and a 'tokens' bucket. Buckets are created and corrected from
+    the x-ratelimit-* headers of API responses: the level is set to the reported remaining
+    budget and the refill rate is chosen so the bucket is full again at the reported reset
+    time. Until a model's first response arrives its calls are not limited.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.waits = 0
+        self.waited_s = 0.0
+
+    def reserve(self, model: str, tokens: int = 0) -> float:
+        """
+        Takes one request and `tokens` tokens from the model's buckets if both are available.
+
+        Returns:
+            float: 0 if the budget was taken, otherwise the seconds to wait before trying again.
+        """
+        if self.backend is None:
+            return 0.0
+        wanted = {f"{model}:requests": 1, f"{model}:tokens": tokens}
+        now = time.time()
+        with self.backend.transaction(list(wanted)) as buckets:
+            wait = 0.0
+            for key, amount in wanted.items():
+                bucket = buckets.get(key)
+                if bucket is None or not amount:
+                    continue
+                _refill(bucket, now)
+                # A request bigger than the whole bucket only has to wait for a full bucket
+                needed = min(amount, bucket[1])
+                if bucket[0] < needed:
+                    wait = max(wait, (needed - bucket[0]) / bucket[2] if bucket[2] > 0 else RATE_LIMIT_MAX_SLEEP)
+            if wait:
+                return wait
+            for key, amount in wanted.items():
+                if key in buckets:
+                    buckets[key][0] -= amount
+        return 0.0
+
+    def acquire(self, model: str, tokens: int = 0):
+        """Blocks until the model's budget allows one request of `tokens` tokens."""
+        while True:
+            wait = self.reserve(model, tokens)
+            if not wait:
+                return
+            self._record_wait(wait)
+            time.sleep(min(wait, RATE_LIMIT_MAX_SLEEP))
+
+    async def async_acquire(self, model: str, tokens: int = 0):
+        """
+        Async twin of acquire().
+
+        Only the in-memory backend is consulted on the event loop; other backends can block on
+        disk or on other processes' locks, so their reservations run in a worker thread.
+        """
+        while True:
+            if self._blocks():
+                wait = await asyncio.to_thread(self.reserve, model, tokens)
+            else:
+                wait = self.reserve(model, tokens)
+            if not wait:
+                return
+            self._record_wait(wait)
+            await asyncio.sleep(min(wait, RATE_LIMIT_MAX_SLEEP))
+
+    def _blocks(self) -> bool:
+        """Whether backend transactions can block, so async callers must run them in a thread."""
+        return self.backend is not None and not isinstance(self.backend, MemoryBackend)
+
+    def _record_wait(self, wait: float):
+        self.waits += 1
+        self.waited_s += min(wait, RATE_LIMIT_MAX_SLEEP)
+
+    def update(self, model: str, headers):
+        """Corrects the model's buckets from the x-ratelimit-* headers of a response."""
+        if self.backend is None or headers is None:
+            return
+        limits = parse_rate_limit_headers(headers)
+        updates = {}
+        for resource in ("requests", "tokens"):
+            remaining = limits[f"remaining_{resource}"]
+            if remaining is None:
+                continue
+            capacity = max(limits[f"limit_{resource}"] or 0, remaining)
+            reset = limits[f"reset_{resource}"]
+            if reset and capacity > remaining:
+                rate = (capacity - remaining) / reset
+            else:
+                # Limits are per minute, so a drained bucket refills in at most 60 seconds
+                rate = capacity / 60
+            updates[f"{model}:{resource}"] = [float(remaining), float(capacity), rate]
+        if not updates:
+            return
+        now = time.time()
+        with self.backend.transaction(list(updates)) as buckets:
+            for key, (level, capacity, rate) in updates.items():
+                buckets[key] = [level, capacity, rate, now]
+
+    async def async_update(self, model: str, headers):
+        """Async twin of update(); like async_acquire(), blocking backends are updated in a worker thread."""
+        if self._blocks():
+            await asyncio.to_thread(self.update, model, headers)
+        else:
+            self.update(model, headers)
+
+    def stats(self) -> dict:
+        return {"waits": self.waits, "waited_s": self.waited_s}
+
+
+def parse_reset_duration(value: str) -> float:
+    """Parses an x-ratelimit-reset-* value such as '1s', '6m0s' or '250ms' into seconds."""
+    if not value:
+        return None
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def parse_rate_limit_headers(headers) -> dict:
+    """
+    Reads the OpenAI rate limit headers of a response.
+
+    Returns:
+        dict: limit_requests, limit_tokens, remaining_requests, remaining_tokens (ints) and
+            reset_requests, reset_tokens (seconds); missing headers are None.
+    """
+    def read_int(name):
+        value = headers.get(name)
+        try:
+            return int(value) if value is not None else None
+        except ValueError:
+            return None
+
+    return {
+        "limit_requests": read_int("x-ratelimit-limit-requests"),
+        "limit_tokens": read_int("x-ratelimit-limit-tokens"),
+        "remaining_requests": read_int("x-ratelimit-remaining-requests"),
+        "remaining_tokens": read_int("x-ratelimit-remaining-tokens"),
+        "reset_requests": parse_reset_duration(headers.get("x-ratelimit-reset-requests")),
+        "reset_tokens": parse_reset_duration(headers.get("x-ratelimit-reset-tokens")),
+    }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide rate limiter, using the backend chosen by RATE_LIMIT_BACKEND."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                if RATE_LIMIT_BACKEND == "off":
+                    backend = None
+                elif RATE_LIMIT_BACKEND == "sqlite":
+                    backend = SQLiteBackend()
+                else:
+                    backend = MemoryBackend()
+                _limiter = RateLimiter(backend)
+    return _limiter
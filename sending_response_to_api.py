@@ -1,4 +1,4 @@
-import requests
+import http_client
 import json
 import os
 
@@ -12,7 +12,7 @@ AIDEVS_MY_APIKEY = os.getenv("AIDEVS_MY_APIKEY")
 data_url = f"{POLIGON_BASE_URL}/dane.txt"
 
 # Send the GET request
-response = requests.get(data_url)
+response = http_client.get(data_url)
 
 # Check if the request was successful
 if response.status_code == 200:
@@ -34,7 +34,7 @@ payload = {
 }
 
 # Send the POST request
-response = requests.post(verify_url, data=json.dumps(payload))
+response = http_client.post(verify_url, data=json.dumps(payload))
 
 # Check if the request was successful
 if response.status_code == 200:
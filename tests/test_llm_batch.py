@@ -0,0 +1,58 @@
+import pytest
+
+import llm_batch
+from llm_batch import LocalBatchServer, run_batch
+
+
+def chat_request(content):
+    return {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": content}]}
+
+
+@pytest.fixture(autouse=True)
+def batch_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_batch, "BATCH_DIR", str(tmp_path))
+
+
+def run_local(requests, responder):
+    server = LocalBatchServer(responder=responder).start()
+    try:
+        return run_batch(requests, backend=server.backend(), name="test", poll_interval=0.05, timeout=10)
+    finally:
+        server.stop()
+
+
+def test_run_batch_maps_answers_to_custom_ids():
+    requests = {"a": chat_request("first"), "b": chat_request("second")}
+
+    results, errors = run_local(requests, llm_batch.echo_responder)
+
+    assert errors == {}
+    assert {custom_id: body["choices"][0]["message"]["content"] for custom_id, body in results.items()} == {
+        "a": "first",
+        "b": "second",
+    }
+
+
+def test_run_batch_reads_failed_requests_from_error_file():
+    def responder(body):
+        if body["messages"][-1]["content"] == "bad":
+            raise ValueError("cannot answer")
+        return "ok"
+
+    requests = {"good": chat_request("fine"), "bad": chat_request("bad")}
+
+    results, errors = run_local(requests, responder)
+
+    assert list(results) == ["good"]
+    assert list(errors) == ["bad"]
+    assert errors["bad"]["error"]["message"] == "cannot answer"
+
+
+def test_run_batch_with_only_failures_has_no_output_file():
+    def responder(body):
+        raise RuntimeError("down")
+
+    results, errors = run_local({"x": chat_request("x")}, responder)
+
+    assert results == {}
+    assert set(errors) == {"x"}
@@ -1,15 +1,6 @@
-from openai import OpenAI, OpenAIError
-import os
+from openai import OpenAIError
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
-OPENAI_ORGANIZATION_ID = os.getenv("OPENAI_ORGANIZATION_ID")
-
-client = OpenAI(
-    organization=OPENAI_ORGANIZATION_ID,
-    project=OPENAI_PROJECT_ID,
-    api_key=OPENAI_API_KEY,
-)
+from llm_client import chat
 
 
 system_message = """
@@ -21,7 +12,7 @@ Typescript code will be provided in the prompt. You need to convert it to Python
 
 def get_custom_response(prompt):
     try:
-        chat_response = client.chat.completions.create(
+        chat_response = chat(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": system_message},
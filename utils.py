@@ -1,12 +1,32 @@
-import requests
 import json
 import os
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+import http_client
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_TYPES = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "null": (type(None),),
+}
+
+TxtFile = namedtuple("TxtFile", ["filename", "path", "size", "mtime", "content"])
 
 
 def post_json_data_to_url(payload: dict, submit_url: str):
     # Submit the processed output
     headers = {'Content-Type': 'application/json'}
-    submission_response = requests.post(submit_url, json=payload, headers=headers)
+    submission_response = http_client.post(submit_url, json=payload, headers=headers)
 
     if submission_response.status_code == 200:
         print("Submission successful.")
@@ -21,7 +41,7 @@ def post_json_data_to_url(payload: dict, submit_url: str):
 
 def post_params_to_url(params: str, url: str):
     # Send the POST request
-    response = requests.post(url, params=params)
+    response = http_client.post(url, params=params)
 
     # Check the response
     if response.status_code == 200:
@@ -31,52 +51,301 @@ def post_params_to_url(params: str, url: str):
         print('Failed to send request:', response.status_code, response.text)
 
 
-def verify_json(json_str, required_keys=None):
+def get_response_from_url(url, input_json):
+    response = http_client.get(url, json=input_json)
+    return response.json()
+
+
+async def async_post_json_data_to_url(payload: dict, submit_url: str):
+    # Async twin of post_json_data_to_url
+    headers = {'Content-Type': 'application/json'}
+    submission_response = await http_client.async_post(submit_url, json=payload, headers=headers)
+
+    if submission_response.status_code == 200:
+        print("Submission successful.")
+        print(submission_response.text)
+    else:
+        print(f" Submission failed. Status code: {submission_response.status_code}")
+        print(submission_response.text)
+    return submission_response
+
+
+async def async_post_params_to_url(params: str, url: str):
+    # Async twin of post_params_to_url
+    response = await http_client.async_post(url, params=params)
+
+    if response.status_code == 200:
+        print('Response:', response)
+        return response
+    else:
+        print('Failed to send request:', response.status_code, response.text)
+
+
+async def async_get_response_from_url(url, input_json):
+    response = await http_client.async_get(url, json=input_json)
+    return response.json()
+
+
+def compile_schema(schema: dict):
+    """
+    Compiles a JSON-Schema-like dict into a validator function.
+
+    Supported keywords: type ('object', 'array', 'string', 'integer', 'number', 'boolean', 'null'
+    or a list of those), properties, required, additionalProperties (bool), items and enum.
+    Compiling once and reusing the validator avoids re-walking the schema for every document.
+
+    Args:
+        schema (dict): The schema to compile.
+
+    Returns:
+        callable: validate(obj, path='$') that raises ValueError describing the first mismatch.
+    """
+    if callable(schema):
+        return schema
+
+    checks = []
+
+    if "type" in schema:
+        types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        unknown = [t for t in types if t not in JSON_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown schema type: {', '.join(unknown)}")
+        python_types = tuple(t for name in types for t in JSON_TYPES[name])
+        # bool is a subclass of int, so it has to be rejected explicitly for numeric types
+        allow_bool = "boolean" in types
+
+        def check_type(obj, path):
+            if not isinstance(obj, python_types) or (isinstance(obj, bool) and not allow_bool):
+                raise ValueError(f"{path}: expected {' or '.join(types)}, got {type(obj).__name__}")
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+
+        def check_enum(obj, path):
+            if obj not in allowed:
+                raise ValueError(f"{path}: {obj!r} is not one of {allowed}")
+        checks.append(check_enum)
+
+    if "required" in schema:
+        required = list(schema["required"])
+
+        def check_required(obj, path):
+            if isinstance(obj, dict):
+                missing_keys = [key for key in required if key not in obj]
+                if missing_keys:
+                    raise ValueError(f"{path}: missing required keys: {', '.join(missing_keys)}")
+        checks.append(check_required)
+
+    if "properties" in schema:
+        properties = {key: compile_schema(sub) for key, sub in schema["properties"].items()}
+
+        def check_properties(obj, path):
+            if isinstance(obj, dict):
+                for key, validate in properties.items():
+                    if key in obj:
+                        validate(obj[key], f"{path}.{key}")
+        checks.append(check_properties)
+
+    if schema.get("additionalProperties") is False:
+        known_keys = set(schema.get("properties", {}))
+
+        def check_additional(obj, path):
+            if isinstance(obj, dict):
+                extra_keys = [key for key in obj if key not in known_keys]
+                if extra_keys:
+                    raise ValueError(f"{path}: unexpected keys: {', '.join(extra_keys)}")
+        checks.append(check_additional)
+
+    if "items" in schema:
+        validate_item = compile_schema(schema["items"])
+
+        def check_items(obj, path):
+            if isinstance(obj, list):
+                for i, item in enumerate(obj):
+                    validate_item(item, f"{path}[{i}]")
+        checks.append(check_items)
+
+    def validate(obj, path="$"):
+        for check in checks:
+            check(obj, path)
+        return obj
+
+    return validate
+
+
+def load_json(json_str):
+    """Parses JSON with orjson when it is installed, falling back to the stdlib json module."""
+    if orjson is not None:
+        return orjson.loads(json_str)
+    return json.loads(json_str)
+
+
+def verify_json(json_str, required_keys=None, schema=None):
     """
     Verifies if a string is a valid JSON object and optionally checks for required keys.
 
     Args:
-        json_str (str): The JSON string to validate.
+        json_str (str | bytes | dict): The JSON string to validate.
         required_keys (list, optional): List of keys that must be present in the JSON object.
+        schema (dict | callable, optional): Schema or validator from compile_schema. When given,
+            the schema decides the allowed top-level type instead of requiring an object.
 
     Returns:
-        dict: The parsed JSON object if it is valid and contains required keys.
+        dict | list | str | int | float | bool | None: The parsed JSON value. Without a schema it
+            is always a dict; with one it is whatever top-level type the schema allows.
 
     Raises:
-        ValueError: If the JSON is invalid or required keys are missing.
+        ValueError: If the JSON is invalid, required keys are missing (or required_keys is given
+            for a value that is not an object) or the schema does not match.
     """
     try:
         # Parse JSON string
-        if isinstance(json_str, str):
-            json_obj = json.loads(json_str)
+        if isinstance(json_str, (str, bytes)):
+            json_obj = load_json(json_str)
         elif isinstance(json_str, dict):
             json_obj = json_str
         else:
             raise ValueError("Must be dict or str.")
 
         # Ensure the JSON is a dictionary
-        if not isinstance(json_obj, dict):
+        if schema is None and not isinstance(json_obj, dict):
             raise ValueError("JSON is valid but not an object (dict).")
 
         # Check for required keys, if specified
         if required_keys:
+            if not isinstance(json_obj, dict):
+                raise ValueError("JSON is not an object (dict), so it cannot have the required keys.")
             missing_keys = [key for key in required_keys if key not in json_obj]
             if missing_keys:
                 raise ValueError(f"JSON is missing required keys: {', '.join(missing_keys)}")
 
+        if schema is not None:
+            compile_schema(schema)(json_obj)
+
         return json_obj
 
     except json.JSONDecodeError:
         raise ValueError("Invalid JSON format.")
 
 
+def verify_json_batch(items, required_keys=None, schema=None):
+    """
+    Verifies many JSON documents against the same schema, compiling it only once.
+
+    Args:
+        items (iterable): JSON strings, bytes or dicts.
+        required_keys (list, optional): List of keys that must be present in every object.
+        schema (dict | callable, optional): Schema or validator from compile_schema.
+
+    Returns:
+        tuple: (valid, errors) where valid is a list of (index, parsed object)
+            and errors is a list of (index, error message).
+    """
+    validator = compile_schema(schema) if schema is not None else None
+    valid, errors = [], []
+    for i, item in enumerate(items):
+        try:
+            valid.append((i, verify_json(item, required_keys=required_keys, schema=validator)))
+        except ValueError as e:
+            errors.append((i, str(e)))
+    return valid, errors
+
+
+def verify_jsonl(file_path: str, required_keys=None, schema=None):
+    """
+    Verifies a JSONL file line by line; blank lines are ignored.
+
+    Returns:
+        tuple: (valid, errors) as in verify_json_batch, indexed by 1-based line number.
+    """
+    validator = compile_schema(schema) if schema is not None else None
+    valid, errors = [], []
+    with open(file_path, 'rb') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                valid.append((line_number, verify_json(line, required_keys=required_keys, schema=validator)))
+            except ValueError as e:
+                errors.append((line_number, str(e)))
+    return valid, errors
+
+
+def iter_txt_files(data_path: str, known: dict = None, read_content: bool = True):
+    """
+    Lazily yields the .txt files of a directory, one at a time.
+
+    Args:
+        data_path (str): Directory to scan (not recursive).
+        known (dict, optional): Mapping of filename -> (size, mtime) from a previous run;
+            files whose size and mtime are unchanged are skipped.
+        read_content (bool): If False, only metadata is yielded and content is None.
+
+    Yields:
+        TxtFile: filename, path, size, mtime and content of each file.
+    """
+    with os.scandir(data_path) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".txt") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            if known and known.get(entry.name) == (stat.st_size, stat.st_mtime):
+                continue
+            content = _read_text(entry.path) if read_content else None
+            yield TxtFile(entry.name, entry.path, stat.st_size, stat.st_mtime, content)
+
+
+def read_txt_files_parallel(data_path: str, max_workers: int = 8, max_pending: int = 64, known: dict = None,
+                            ordered: bool = False):
+    """
+    Reads the .txt files of a directory on a thread pool, yielding them as they finish.
+
+    At most max_pending files are read but not yet consumed at any time, so memory stays
+    bounded regardless of the size of the directory.
+
+    Args:
+        data_path (str): Directory to scan (not recursive).
+        max_workers (int): Number of reader threads.
+        max_pending (int): Maximum number of files read ahead of the consumer.
+        known (dict, optional): Mapping of filename -> (size, mtime); unchanged files are skipped.
+        ordered (bool): Yield the files sorted by filename instead of in completion order. Only
+            the names are sorted up front; contents are still read at most max_pending ahead.
+
+    Yields:
+        TxtFile: filename, path, size, mtime and content of each file.
+    """
+    def read(meta):
+        return meta._replace(content=_read_text(meta.path))
+
+    if ordered:
+        metas = sorted(iter_txt_files(data_path, known=known, read_content=False), key=lambda meta: meta.filename)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for meta in metas:
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(read, meta))
+            while pending:
+                yield pending.popleft().result()
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for meta in iter_txt_files(data_path, known=known, read_content=False):
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(read, meta))
+        for future in as_completed(pending):
+            yield future.result()
+
+
 def read_txt_files(data_path: str) -> dict:
-    files_dict = {}
-    
-    for filename in os.listdir(data_path):
-        if filename.endswith(".txt"):
-            file_path = os.path.join(data_path, filename)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                files_dict[filename] = f.read()
-                
-    return files_dict
+    return {txt_file.filename: txt_file.content for txt_file in iter_txt_files(data_path)}
+
+
+def _read_text(file_path: str) -> str:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VECTOR_CACHE_DIR = os.getenv("VECTOR_CACHE_DIR", "cache/vectors")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class VectorCache:
+    """
+    On-disk embedding cache for one (model, dimensions, dtype) combination.
+
+    Vectors are appended to a flat binary file that is read back through np.memmap, and
+    keys.txt holds the text hash of each row, one per line, in the same order.
+    """
+
+    def __init__(self, model: str, dimensions: int = None, dtype: str = "float32",
+                 root: str = VECTOR_CACHE_DIR):
+        if dtype not in ("float32", "float16"):
+            raise ValueError("dtype must be float32 or float16.")
+        safe_model = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        self.directory = os.path.join(root, f"{safe_model}-{dimensions or 'native'}-{dtype}")
+        self.dtype = np.dtype(dtype)
+        self.dimensions = dimensions
+        self.vectors_path = os.path.join(self.directory, "vectors.bin")
+        self.keys_path = os.path.join(self.directory, "keys.txt")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._memmap = None
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                self.dimensions = json.load(f)["dimensions"]
+        if not os.path.exists(self.keys_path) or self.dimensions is None:
+            return
+        with open(self.keys_path, "r") as f:
+            keys = f.read().split()
+        row_size = self.dimensions * self.dtype.itemsize
+        stored_bytes = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else None
+
+        # An interrupted append or a lost vectors file can leave the two files out of step; trim
+        # both to the common prefix, recreating the vectors file if it is missing
+        rows = min(len(keys), (stored_bytes or 0) // row_size)
+        if stored_bytes != rows * row_size:
+            with open(self.vectors_path, "r+b" if stored_bytes is not None else "wb") as f:
+                f.truncate(rows * row_size)
+        if len(keys) != rows:
+            keys = keys[:rows]
+            with open(self.keys_path, "w") as f:
+                f.writelines(key + "\n" for key in keys)
+
+        self._rows = {key: row for row, key in enumerate(keys)}
+        self._memmap = None
+
+    def _vectors(self):
+        if self._memmap is None and self._rows:
+            self._memmap = np.memmap(self.vectors_path, dtype=self.dtype, mode="r",
+                                     shape=(len(self._rows), self.dimensions))
+        return self._memmap
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key: str):
+        return key in self._rows
+
+    def get_many(self, keys: list) -> dict:
+        """Returns {key: vector} for the keys that are cached."""
+        with self._lock:
+            rows = [(key, self._rows[key]) for key in keys if key in self._rows]
+            if not rows:
+                return {}
+            vectors = self._vectors()
+            return {key: np.asarray(vectors[row], dtype=np.float32) for key, row in rows}
+
+    def add_many(self, keys: list, vectors):
+        """Appends vectors for new keys; keys that are already cached are skipped."""
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        with self._lock:
+            if self.dimensions is None:
+                self.dimensions = vectors.shape[1]
+            if not os.path.exists(self.meta_path):
+                with open(self.meta_path, "w") as f:
+                    json.dump({"dimensions": self.dimensions, "dtype": self.dtype.name}, f)
+
+            new_rows, seen = [], set()
+            for i, key in enumerate(keys):
+                if key not in self._rows and key not in seen:
+                    new_rows.append(i)
+                    seen.add(key)
+            if not new_rows:
+                return
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors[new_rows].tobytes())
+            with open(self.keys_path, "a") as f:
+                for i in new_rows:
+                    self._rows[keys[i]] = len(self._rows)
+                    f.write(keys[i] + "\n")
+            self._memmap = None
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_vector_cache(model: str, dimensions: int = None, dtype: str = "float32") -> VectorCache:
+    """Returns the shared VectorCache for the given model, dimensions and dtype."""
+    key = (model, dimensions, dtype)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = VectorCache(model, dimensions=dimensions, dtype=dtype)
+        return _caches[key]